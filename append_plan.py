@@ -0,0 +1,38 @@
+"""Per-destination append plan for the low-disk-space merge variants (their --grouped mode)."""
+import os
+from collections import defaultdict
+
+from file_mover import move_file
+from merge_engine import append_and_consume, MERGE_SEPARATOR
+
+
+def group_by_destination(routes):
+    """Groups (src_file_path, dest_dir_path) pairs into {dest_dir_path: [src_file_path, ...]}."""
+    groups = defaultdict(list)
+    for src_file_path, dest_dir_path in routes:
+        groups[dest_dir_path].append(src_file_path)
+    return groups
+
+
+def plan_append(dest_dir_path, src_file_paths):
+    """Returns the .txt files already in dest_dir_path plus src_file_paths, sorted; the first names the target."""
+    existing = [os.path.join(dest_dir_path, f) for f in os.listdir(dest_dir_path) if f.endswith('.txt')]
+    members = sorted(existing + list(src_file_paths), key=os.path.basename)
+    return members
+
+
+def merge_into_destination(dest_dir_path, src_file_paths, separator=MERGE_SEPARATOR):
+    """Runs the append plan for one destination; returns (target_path, files appended)."""
+    members = plan_append(dest_dir_path, src_file_paths)
+    while members:
+        first = members.pop(0)
+        target_path = os.path.join(dest_dir_path, os.path.basename(first))
+        try:
+            if first != target_path:
+                move_file(first, target_path)
+            break
+        except FileNotFoundError:
+            print("Source file does not exist:", first)
+    else:
+        return None, 0
+    return target_path, append_and_consume(target_path, members, separator)
@@ -0,0 +1,78 @@
+"""asyncio engine that keeps many file operations in flight on network file systems."""
+import asyncio
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def make_dir(dir_path):
+    os.makedirs(dir_path, exist_ok=True)
+
+
+class AsyncFileEngine:
+    """Runs (order key, fn, args) jobs on offload threads, ordered per key, many in flight."""
+
+    def __init__(self, offload_workers=64, max_in_flight=512):
+        self.offload_workers = offload_workers
+        self.max_in_flight = max_in_flight
+        self.completed = 0
+        self.peak_in_flight = 0
+
+    def run(self, jobs):
+        """Runs every job and returns how many completed; raises the first job error."""
+        return asyncio.run(self._run(jobs))
+
+    async def _run(self, jobs):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.max_in_flight)
+        waiting = {}  # order key -> deque of the jobs queued behind the one running for it
+        errors = []
+        state = {'in_flight': 0, 'submitting': True}
+        all_done = asyncio.Event()
+
+        def start(key, fn, args):
+            future = loop.run_in_executor(executor, fn, *args)
+            future.add_done_callback(lambda future: finished(key, future))
+
+        def finished(key, future):
+            if future.exception() is not None:
+                errors.append(future.exception())
+            else:
+                self.completed += 1
+            release(1)
+            queue = waiting[key]
+            if queue and not errors:
+                start(key, *queue.popleft())
+                return
+            # After an error the jobs still queued for this key are dropped, not started
+            release(len(queue))
+            del waiting[key]
+            if not state['submitting'] and state['in_flight'] == 0:
+                all_done.set()
+
+        def release(count):
+            state['in_flight'] -= count
+            for _ in range(count):
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.offload_workers, thread_name_prefix='offload') as executor:
+            for key, fn, args in jobs:
+                await slots.acquire()
+                if errors:
+                    slots.release()
+                    break
+                state['in_flight'] += 1
+                self.peak_in_flight = max(self.peak_in_flight, state['in_flight'])
+                queue = waiting.get(key)
+                if queue is None:
+                    waiting[key] = deque()
+                    start(key, fn, args)
+                else:
+                    queue.append((fn, args))  # Runs once the key's earlier jobs are done
+            state['submitting'] = False
+            if state['in_flight']:
+                await all_done.wait()
+
+        if errors:
+            raise errors[0]
+        return self.completed
@@ -0,0 +1,87 @@
+"""
+Benchmark: fixed ThreadPoolExecutor(max_workers=10) vs worker_pool.AdaptivePool for moves.
+
+usage: python bench_adaptive_pool.py [files] [latency_ms ...]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from file_mover import move_file
+from worker_pool import AdaptivePool
+
+DEST_DIRS = 300
+
+
+def move(src_file_path, dest_file_path, latency):
+    if latency:
+        time.sleep(latency)
+    move_file(src_file_path, dest_file_path)
+
+
+def jobs(src_dir, dest_dir, files, latency):
+    for i in range(files):
+        name = 'domain%d_GB_5_D06_%d.txt' % (i % DEST_DIRS, i)
+        yield os.path.join(src_dir, name), os.path.join(dest_dir, 'domain%d' % (i % DEST_DIRS), name), latency
+
+
+def fixed_pool(job_iter):
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        futures = [executor.submit(move, *job) for job in job_iter]
+        for future in futures:
+            future.result()
+    return 10
+
+
+def adaptive_pool(job_iter):
+    with AdaptivePool() as pool:
+        for _ in pool.map(move, job_iter):
+            pass
+    return "%d (peak %d)" % (pool.workers, pool.peak_workers)
+
+
+def run(strategy, files, latency, tmp_dir, trace=False):
+    src_dir = os.path.join(tmp_dir, 'source')
+    dest_dir = os.path.join(tmp_dir, 'cdrs')
+    os.makedirs(src_dir)
+    for i in range(DEST_DIRS):
+        os.makedirs(os.path.join(dest_dir, 'domain%d' % i))
+    for src_file_path, _, _ in jobs(src_dir, dest_dir, files, 0):
+        open(src_file_path, 'w').close()
+
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    workers = strategy(jobs(src_dir, dest_dir, files, latency))
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    shutil.rmtree(src_dir)
+    shutil.rmtree(dest_dir)
+    return files / elapsed, peak, workers
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    latencies = [float(arg) / 1000 for arg in sys.argv[2:]] or [0.0, 2.0 / 1000]
+
+    print("%d files, %d destination dirs" % (files, DEST_DIRS))
+    print("%10s %-10s %12s %12s  %s" % ('latency', 'pool', 'files/s', 'peak MiB', 'workers'))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for latency in latencies:
+            run_files = files if not latency else min(files, int(20 / latency))  # About 20 s of sleeps
+            for name, strategy in (('fixed-10', fixed_pool), ('adaptive', adaptive_pool)):
+                rate, _, workers = run(strategy, run_files, latency, tmp_dir)
+                _, peak, _ = run(strategy, run_files, latency, tmp_dir, trace=True)
+                print("%8.1fms %-10s %12.0f %12.1f  %s" % (latency * 1000, name, rate, peak / 2 ** 20, workers))
+
+
+if __name__ == '__main__':
+    main()
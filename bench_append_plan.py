@@ -0,0 +1,60 @@
+"""
+Benchmark: per-file move-then-merge against the grouped per-destination append plan.
+
+usage: python bench_append_plan.py [files] [destinations]
+"""
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import final_test_mp_fmapp_merg as merge_variant
+
+
+def build(tmp_dir, files, destinations):
+    txt_files_path = os.path.join(tmp_dir, 'txtFiles')
+    base_path = os.path.join(tmp_dir, 'destFolders')
+    os.makedirs(txt_files_path)
+    domain_index = set()
+    for d in range(destinations):
+        key = ('dom%d' % d, 'GB', 'numbers', 'D%02d' % d)
+        domain_index.add(key)
+        os.makedirs(os.path.join(base_path, *key, 'CDR'))
+    for i in range(files):
+        d = i % destinations
+        name = 'dom%d_gb_5_d%02d_0_0_numbers_%06d.txt' % (d, d, i)
+        with open(os.path.join(txt_files_path, name), 'w') as f:
+            f.write('call record %d\n' % i)
+    return txt_files_path, base_path, frozenset(domain_index)
+
+
+def run(grouped, files, destinations):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        txt_files_path, base_path, domain_index = build(tmp_dir, files, destinations)
+        elements = merge_variant.extract_elements(merge_variant.fetch_txt_files(txt_files_path))
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            merge_variant.map_files_to_directories(base_path, txt_files_path, elements, domain_index,
+                                                   grouped=grouped)
+        elapsed = time.perf_counter() - start
+        merged = sum(len(f) for _, _, f in os.walk(base_path))
+        shutil.rmtree(base_path)
+    return elapsed, merged
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    destinations = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    print("%d files into %d destinations" % (files, destinations))
+    print("%-10s %10s %10s %14s" % ('mode', 'seconds', 'files/s', 'merged files'))
+    for label, grouped in (('per-file', False), ('grouped', True)):
+        elapsed, merged = run(grouped, files, destinations)
+        print("%-10s %10.2f %10.0f %14d" % (label, elapsed, files / elapsed, merged))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: map_files_to_directories with a sleep per metadata call, threads vs async engine.
+
+usage: python bench_async_engine.py [files] [latency_ms]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import fileMapping
+
+DEST_DIRS = 200
+DATE_TIME_STR = '260101071500'
+OFFLOAD_WORKERS = [16, 64, 256]
+
+
+@contextmanager
+def injected_latency(latency):
+    """Makes every os.stat, os.mkdir and os.replace wait latency seconds first."""
+    originals = {name: getattr(os, name) for name in ('stat', 'mkdir', 'replace')}
+
+    def slowed(call):
+        def wrapper(*args, **kwargs):
+            time.sleep(latency)
+            return call(*args, **kwargs)
+        return wrapper
+
+    for name, call in originals.items():
+        setattr(os, name, slowed(call))
+    try:
+        yield
+    finally:
+        for name, call in originals.items():
+            setattr(os, name, call)
+
+
+def make_merged_files(lab_dir, files):
+    domain_index = set()
+    merged_files = []
+    for i in range(files):
+        key = ('dom%d' % (i % DEST_DIRS), 'GB', '2', 'D%d' % i)
+        domain_index.add(key)
+        merged_file_path = os.path.join(lab_dir, fileMapping.merged_file_name_for(key, DATE_TIME_STR))
+        open(merged_file_path, 'w').close()
+        merged_files.append(merged_file_path)
+    return merged_files, domain_index
+
+
+def run(tmp_dir, files, latency, engine, offload_workers=64):
+    lab_dir = os.path.join(tmp_dir, 'lab')
+    cdrs_dir = os.path.join(tmp_dir, 'cdrs')
+    os.makedirs(lab_dir)
+    merged_files, domain_index = make_merged_files(lab_dir, files)
+
+    with injected_latency(latency):
+        start = time.perf_counter()
+        fileMapping.map_files_to_directories(cdrs_dir, merged_files, domain_index, DATE_TIME_STR, 'A',
+                                             log_file_path=os.path.join(tmp_dir, 'processed_files_log.txt'),
+                                             engine=engine, offload_workers=offload_workers)
+        elapsed = time.perf_counter() - start
+
+    moved = sum(len(names) for _, _, names in os.walk(cdrs_dir))
+    assert moved == files, (moved, files)
+    for path in (lab_dir, cdrs_dir):
+        shutil.rmtree(path)
+    os.remove(os.path.join(tmp_dir, 'processed_files_log.txt'))
+    return files / elapsed
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.002
+
+    print("%d merged files into %d dirs, %.1f ms per stat/mkdir/replace" % (files, DEST_DIRS, latency * 1000))
+    print("%-22s %12s" % ('engine', 'files/s'))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print("%-22s %12.0f" % ('threads (adaptive)', run(tmp_dir, files, latency, 'threads')))
+        for offload_workers in OFFLOAD_WORKERS:
+            rate = run(tmp_dir, files, latency, 'async', offload_workers)
+            print("%-22s %12.0f" % ('async, %d offload' % offload_workers, rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: composite-key domain index against the old four-set check.
+
+usage: python bench_domain_index.py [synthetic_lines]
+"""
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+from domain_index import read_domain_index, METADATA_FIELDS
+
+PROBES = 1000000
+
+
+def read_domain_sets(file_path):
+    # The pre-index representation, kept here only for comparison
+    first_elements, second_elements, third_elements, fourth_elements = set(), set(), set(), set()
+    with open(file_path, 'r') as f:
+        for line in f:
+            parts = line.strip().split('/')
+            if len(parts) >= 4:
+                first_elements.add(parts[0])
+                second_elements.add(parts[1].upper())
+                third_elements.add(parts[2])
+                fourth_elements.add(parts[3].upper())
+    return first_elements, second_elements, third_elements, fourth_elements
+
+
+def write_synthetic_domain_file(file_path, lines):
+    # Same shape as test4.py: random domain, a country, a digit, a group code
+    countries = ["gb", "de", "fr", "us", "jp", "au", "br", "mx", "ca", "it"]
+    alphabet = string.ascii_lowercase + string.digits
+    with open(file_path, 'w') as f:
+        for _ in range(lines):
+            f.write("%s/%s/%d/%s/0/0/%s/12/\n" % (
+                ''.join(random.choice(alphabet) for _ in range(8)),
+                random.choice(countries),
+                random.randint(0, 9),
+                ''.join(random.choice(alphabet) for _ in range(3)),
+                random.choice(["ces", "ads", "pov", "fax", "dvr", "iptv"])))
+
+
+def make_probes(domain_index, count):
+    keys = list(domain_index)
+    probes = []
+    for _ in range(count // 2):
+        probes.append(random.choice(keys))
+        # Fields taken from four different lines
+        probes.append(tuple(random.choice(keys)[i] for i in range(4)))
+    return probes
+
+
+def time_four_sets(domain_sets, probes):
+    first_elements, second_elements, third_elements, fourth_elements = domain_sets
+    accepted = 0
+    start = time.perf_counter()
+    for first, second, third, fourth in probes:
+        if first in first_elements and second in second_elements and \
+                third in third_elements and fourth in fourth_elements:
+            accepted += 1
+    return time.perf_counter() - start, accepted
+
+
+def time_index(domain_index, probes):
+    accepted = 0
+    start = time.perf_counter()
+    for key in probes:
+        if key in domain_index:
+            accepted += 1
+    return time.perf_counter() - start, accepted
+
+
+def run(label, file_path):
+    domain_sets = read_domain_sets(file_path)
+    domain_index = read_domain_index(file_path, METADATA_FIELDS)
+    probes = make_probes(domain_index, PROBES)
+
+    sets_time, sets_accepted = time_four_sets(domain_sets, probes)
+    index_time, index_accepted = time_index(domain_index, probes)
+
+    print("%s: %d keys, %d probes" % (label, len(domain_index), len(probes)))
+    print("  four sets : %7.1f ns/lookup, accepted %d" % (sets_time * 1e9 / len(probes), sets_accepted))
+    print("  key index : %7.1f ns/lookup, accepted %d" % (index_time * 1e9 / len(probes), index_accepted))
+    print("  mixed-line keys wrongly accepted by the four sets: %d" % (sets_accepted - index_accepted))
+
+
+def main():
+    synthetic_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    random.seed(7)
+
+    run('input/domain_file.txt', os.path.join('input', 'domain_file.txt'))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        synthetic_path = os.path.join(tmp_dir, 'domain_file.txt')
+        write_synthetic_domain_file(synthetic_path, synthetic_lines)
+        run('synthetic %d lines' % synthetic_lines, synthetic_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark: memory, pickled size and time of extract_elements tuples against ElementBatch columns.
+
+usage: python bench_element_batch.py [names] [distinct keys]
+"""
+import gc
+import pickle
+import random
+import sys
+import time
+import tracemalloc
+
+from domain_index import DEST_FIELDS
+from element_batch import ElementBatch
+from filename_parser import parse_elements
+
+
+def make_names(count, distinct_keys):
+    rng = random.Random(9)
+    keys = ['dom%d_gb_%d_d%02d_0_0_grp%d' % (k % 97, k % 5, k % 89, k % 7) for k in range(distinct_keys)]
+    names = ['%s_%d.txt' % (rng.choice(keys), i) for i in range(count)]
+    for i in range(0, count, 1000):
+        names[i] = 'bad_name_%d.txt' % i
+    return names
+
+
+def measure(label, build, names):
+    gc.collect()
+    start = time.perf_counter()
+    value = build(names)
+    build_time = time.perf_counter() - start
+
+    # Built a second time for the memory figure, since tracing slows the build down
+    del value
+    gc.collect()
+    tracemalloc.start()
+    value = build(names)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    dump_time = time.perf_counter() - start
+    start = time.perf_counter()
+    pickle.loads(data)
+    load_time = time.perf_counter() - start
+    print("%-14s %10.1f %12.1f %9.2f %9.2f %9.2f" % (
+        label, retained / 2 ** 20, len(data) / 2 ** 20, build_time, dump_time, load_time))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    distinct_keys = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    names = make_names(count, distinct_keys)
+
+    print("%d names, %d distinct keys" % (count, distinct_keys))
+    print("%-14s %10s %12s %9s %9s %9s" % ('form', 'MiB held', 'MiB pickled', 'build s', 'dump s', 'load s'))
+    measure('tuples', lambda names: parse_elements(names, DEST_FIELDS), names)
+    measure('ElementBatch', lambda names: ElementBatch.from_names(names, DEST_FIELDS), names)
+
+
+if __name__ == '__main__':
+    main()
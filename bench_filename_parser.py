@@ -0,0 +1,78 @@
+"""
+Benchmark: filename_parser against the per-script parsers it replaces.
+
+usage: python bench_filename_parser.py [names]
+"""
+import random
+import re
+import sys
+import time
+
+from domain_index import DEST_FIELDS
+from filename_parser import parse_elements, parse_log_name, parse_log_names
+
+
+def old_extract_elements(file_names):
+    extracted_elements = []
+    for file_name in file_names:
+        parts = file_name.split('_')
+        if len(parts) >= 7:  # Ensure there are enough parts
+            first_element = parts[0]
+            second_element = parts[1].upper()
+            fourth_element = parts[3].upper()
+            seventh_element = parts[6]
+            extra_element = 'CDR'
+            extracted_elements.append(
+                (first_element, second_element, seventh_element, fourth_element, extra_element, file_name))
+        else:
+            # Add to exceptions if format is not correct
+            extracted_elements.append(('EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'CDR', file_name))
+    return extracted_elements
+
+
+def old_parse_filename(filename):
+    match = re.match(r'^(.*?)_(.*?)_(\d{12})\.txt$', filename)
+    if match:
+        return match.group(1), match.group(2), match.group(3)
+    return None, None, None
+
+
+def make_names(count):
+    rng = random.Random(5)
+    domains = ['8x8439', '10tel411', '42com9', '3star170', '01tel918']
+    countries = ['gb', 'de', 'fr', 'be', 'nl']
+    groups = ['in-for-resellers', 'geographic-number-hosting', 'numbers']
+    cdr_names = ['%s_%s_%d_d%02d_0_0_%s_%d.txt' % (rng.choice(domains), rng.choice(countries), rng.randint(1, 5),
+                                                     rng.randint(0, 99), rng.choice(groups), i)
+                 for i in range(count)]
+    log_names = ['%s_%s_%d_D%02d_%012d.txt' % (rng.choice(domains), rng.choice(countries).upper(),
+                                                rng.randint(1, 5), rng.randint(0, 99), 240723000000 + i)
+                 for i in range(count)]
+    return cdr_names, log_names
+
+
+def timed(label, fn, names):
+    start = time.perf_counter()
+    result = fn(names)
+    elapsed = time.perf_counter() - start
+    print("%-32s %8.3f s %10.0f names/s" % (label, elapsed, len(names) / elapsed))
+    return result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    cdr_names, log_names = make_names(count)
+    print("%d names" % count)
+
+    old = timed('extract_elements (old)', old_extract_elements, cdr_names)
+    new = timed('parse_elements', lambda names: parse_elements(names, DEST_FIELDS), cdr_names)
+    assert old == new
+
+    old = timed('parse_filename re.match (old)', lambda names: [old_parse_filename(n) for n in names], log_names)
+    timed('parse_log_name per name', lambda names: [parse_log_name(n) for n in names], log_names)
+    new = timed('parse_log_names batch', parse_log_names, log_names)
+    assert old == [tuple(log_name) for log_name in new]
+
+
+if __name__ == '__main__':
+    main()
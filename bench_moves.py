@@ -0,0 +1,76 @@
+"""
+Benchmark: move throughput against max_workers, global lock vs lock-free path.
+
+usage: python bench_moves.py [files] [latency_ms]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from file_mover import move_file
+
+WORKER_COUNTS = [1, 2, 4, 10, 20, 40]
+DEST_DIRS = 300
+
+lock = Lock()
+
+
+def locked_move(src_file_path, dest_dir_path, latency):
+    # The pre-change move path of fileMapping.process_file
+    with lock:
+        if not os.path.exists(dest_dir_path):
+            os.makedirs(dest_dir_path)
+        if latency:
+            time.sleep(latency)
+        shutil.move(src_file_path, os.path.join(dest_dir_path, os.path.basename(src_file_path)))
+
+
+def lock_free_move(src_file_path, dest_dir_path, latency):
+    os.makedirs(dest_dir_path, exist_ok=True)
+    if latency:
+        time.sleep(latency)
+    move_file(src_file_path, os.path.join(dest_dir_path, os.path.basename(src_file_path)))
+
+
+def run(mover, workers, files, latency, tmp_dir):
+    src_dir = os.path.join(tmp_dir, 'source')
+    dest_dir = os.path.join(tmp_dir, 'cdrs')
+    os.makedirs(src_dir)
+    for i in range(files):
+        open(os.path.join(src_dir, 'domain%d_GB_5_D06_%d.txt' % (i % DEST_DIRS, i)), 'w').close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(mover, os.path.join(src_dir, 'domain%d_GB_5_D06_%d.txt' % (i % DEST_DIRS, i)),
+                                   os.path.join(dest_dir, 'domain%d' % (i % DEST_DIRS)), latency)
+                   for i in range(files)]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    shutil.rmtree(src_dir)
+    shutil.rmtree(dest_dir)
+    return files / elapsed
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0
+    if latency:
+        files = min(files, 2000)  # Keep the locked runs short
+
+    print("%d files, %d destination dirs, %.1f ms injected per move" % (files, DEST_DIRS, latency * 1000))
+    print("%8s %16s %16s" % ('workers', 'global lock/s', 'lock-free/s'))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for workers in WORKER_COUNTS:
+            locked = run(locked_move, workers, files, latency, tmp_dir)
+            lock_free = run(lock_free_move, workers, files, latency, tmp_dir)
+            print("%8d %16.0f %16.0f" % (workers, locked, lock_free))
+
+
+if __name__ == '__main__':
+    main()
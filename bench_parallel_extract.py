@@ -0,0 +1,78 @@
+"""
+Benchmark: extraction wall time against worker count, with the serial scan as the floor.
+
+usage: python bench_parallel_extract.py [files] [directory]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from dir_scanner import iter_txt_file_chunks
+from domain_index import DEST_FIELDS, load_domain_index
+from filename_parser import parse_elements
+from parallel_extract import extract_in_workers, iter_routes
+
+
+def build_directory(directory, files):
+    os.makedirs(directory, exist_ok=True)
+    existing = sum(1 for _ in os.scandir(directory))
+    rng = random.Random(13)
+    for i in range(existing, files):
+        name = 'dom%d_gb_%d_d%02d_0_0_grp%d_%d.txt' % (rng.randint(0, 96), rng.randint(1, 5),
+                                                       rng.randint(0, 88), rng.randint(0, 6), i)
+        open(os.path.join(directory, name), 'w').close()
+
+
+def write_domain_file(domain_file_path):
+    with open(domain_file_path, 'w') as f:
+        for d in range(0, 97, 2):
+            for g in range(7):
+                for n in range(89):
+                    f.write('dom%d/gb/%d/d%02d/0/0/grp%d/12/\n' % (d, n % 5 + 1, n, g))
+
+
+def in_process(directory, domain_index):
+    routed = 0
+    for chunk in iter_txt_file_chunks(directory):
+        for element_tuple in parse_elements(chunk, DEST_FIELDS):
+            routed += element_tuple[:4] in domain_index
+    return routed
+
+
+def in_workers(directory, domain_file_path, workers):
+    results = extract_in_workers(iter_txt_file_chunks(directory), domain_file_path, DEST_FIELDS, workers)
+    return sum(routed for _, routed in iter_routes(results, lambda key: True, False))
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    directory = sys.argv[2] if len(sys.argv) > 2 else os.path.join(tempfile.gettempdir(), 'bench_extract_%d' % files)
+    build_directory(directory, files)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        domain_file_path = os.path.join(tmp_dir, 'domain_file.txt')
+        write_domain_file(domain_file_path)
+        domain_index = load_domain_index(domain_file_path, DEST_FIELDS)
+
+        print("%d files in %s, %d CPUs" % (files, directory, os.cpu_count()))
+        start = time.perf_counter()
+        scanned = sum(len(chunk) for chunk in iter_txt_file_chunks(directory))
+        print("%-12s %8.2f s  (%d names, the serial floor)" % ('scan only', time.perf_counter() - start, scanned))
+
+        start = time.perf_counter()
+        expected = in_process(directory, domain_index)
+        baseline = time.perf_counter() - start
+        print("%-12s %8.2f s  (%d accepted)" % ('in-process', baseline, expected))
+
+        for workers in sorted({1, 2, 4, os.cpu_count() or 1}):
+            start = time.perf_counter()
+            accepted = in_workers(directory, domain_file_path, workers)
+            elapsed = time.perf_counter() - start
+            print("%-12s %8.2f s  %5.2fx in-process" % ('%d workers' % workers, elapsed, baseline / elapsed))
+            assert accepted == expected
+
+
+if __name__ == '__main__':
+    main()
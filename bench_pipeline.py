@@ -0,0 +1,226 @@
+"""
+Benchmark suite: fileMapping.py phase by phase on synthetic CDR corpora; --compare OLD.json diffs two runs.
+
+--sizes is fixed:BYTES, uniform:MIN:MAX, lognormal:MEDIAN:SIGMA or pareto:ALPHA:MIN; --skew is a Zipf exponent.
+
+usage: python bench_pipeline.py [--scales 10k,100k,1m] [--sizes lognormal:512:1.0]
+                                [--skew 1.1] [--keys 2000] [--invalid 0.05]
+                                [--merge-workers 1] [--output bench_pipeline.json]
+                                [--compare OLD.json]
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+
+import fileMapping
+from dir_scanner import iter_txt_file_chunks
+from domain_index import METADATA_FIELDS, default_cache_path, load_domain_index
+from metrics import Metrics
+from processed_log import DEFAULT_LOG_PATH
+
+SCALES = {'10k': 10000, '100k': 100000, '1m': 1000000}
+COUNTRIES = ['gb', 'de', 'fr', 'be', 'nl', 'at', 'ch', 'dk', 'es', 'it']
+CDR_LINE = b'8x8439,GB_5_DA6,1720445352,+441234567890,+491234567890,ANSWERED,118,0.0121\n'
+# The spans fileMapping records in a window, in pipeline order
+PIPELINE_SPANS = ('scan', 'parse', 'merge', 'tar', 'validate', 'move', 'log')
+
+
+def parse_sizes(spec):
+    """Returns a function rng -> file size for a --sizes spec."""
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(':')] if args else []
+    if kind == 'fixed':
+        return lambda rng: int(values[0])
+    if kind == 'uniform':
+        return lambda rng: rng.randint(int(values[0]), int(values[1]))
+    if kind == 'lognormal':
+        mu = math.log(values[0])
+        return lambda rng: max(1, int(rng.lognormvariate(mu, values[1])))
+    if kind == 'pareto':
+        return lambda rng: int(values[1] * rng.paretovariate(values[0]))
+    raise ValueError("Unknown size distribution: %s" % spec)
+
+
+def make_keys(count):
+    return [('dom%d' % (k % 997), COUNTRIES[k % len(COUNTRIES)], str(k % 5 + 1), 'd%d' % k) for k in range(count)]
+
+
+def generate_corpus(corpus_path, files, settings):
+    """Writes resource/domain_file.txt and source/ under corpus_path, unless a finished corpus is there."""
+    done_marker = os.path.join(corpus_path, 'corpus.json')
+    if os.path.exists(done_marker):
+        return
+    if os.path.exists(corpus_path):
+        shutil.rmtree(corpus_path)
+    source_path = os.path.join(corpus_path, 'source')
+    os.makedirs(source_path)
+    os.makedirs(os.path.join(corpus_path, 'resource'))
+
+    rng = random.Random(settings['seed'])
+    keys = make_keys(settings['keys'])
+    with open(os.path.join(corpus_path, 'resource', 'domain_file.txt'), 'w') as f:
+        for key in keys:
+            f.write('%s/%s/%s/%s/0/0/in-for-resellers/12/\n' % key)
+
+    # Zipf weights: rank r gets 1 / r**skew of the files
+    weights = [1.0 / (rank ** settings['skew']) for rank in range(1, len(keys) + 1)]
+    chosen = rng.choices(keys, weights=weights, k=files)
+    size_of = parse_sizes(settings['sizes'])
+    total_bytes = 0
+    for i, key in enumerate(chosen):
+        if rng.random() < settings['invalid']:
+            key = ('unknown%d' % (i % 50),) + key[1:]  # Parses, but is not in the domain file
+        name = '%s_%s_%s_%s_0_0_in-for-resellers_%d.txt' % (key + (i,))
+        size = size_of(rng)
+        with open(os.path.join(source_path, name), 'wb') as f:
+            f.write((CDR_LINE * (size // len(CDR_LINE) + 1))[:size])
+        total_bytes += size
+
+    with open(done_marker, 'w') as f:
+        json.dump(dict(settings, files=files, bytes=total_bytes), f)
+
+
+class Phases:
+    """Collects wall time and item counts per phase, in run order."""
+
+    def __init__(self):
+        self.results = {}
+
+    def timed(self, name, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        self.results[name] = {'seconds': time.perf_counter() - start}
+        return result
+
+    def count(self, name, items, nbytes=None):
+        phase = self.results[name]
+        phase['items'] = items
+        phase['per_second'] = items / phase['seconds'] if phase['seconds'] else None
+        if nbytes is not None:
+            phase['bytes'] = nbytes
+            phase['mib_per_second'] = nbytes / 2 ** 20 / phase['seconds'] if phase['seconds'] else None
+
+
+def run_pipeline(corpus_path, merge_workers):
+    """Runs one fileMapping window in corpus_path the way main() does and returns its phase timings."""
+    for output in ('lab', 'cdrs', os.path.join('resource', 'processed_files_log.txt')):
+        output_path = os.path.join(corpus_path, output)
+        if os.path.isdir(output_path):
+            shutil.rmtree(output_path)
+        elif os.path.exists(output_path):
+            os.remove(output_path)
+
+    cwd = os.getcwd()
+    os.chdir(corpus_path)
+    try:
+        phases = Phases()
+        domain_file_path = os.path.join('resource', 'domain_file.txt')
+        cache_path = default_cache_path(domain_file_path, METADATA_FIELDS)
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+        domain_index = phases.timed('domain_load_cold', load_domain_index, domain_file_path, METADATA_FIELDS)
+        phases.count('domain_load_cold', len(domain_index))
+        phases.timed('domain_load_cached', load_domain_index, domain_file_path, METADATA_FIELDS)
+        phases.count('domain_load_cached', len(domain_index))
+
+        date_time_str, time_period = fileMapping.current_window()
+        metrics = Metrics()
+
+        def window():
+            chunks = metrics.iter_spans('scan', iter_txt_file_chunks('source'))
+            elements = (data for chunk in chunks for data in fileMapping.timed_extract(chunk, metrics))
+            fileMapping.process_window(elements, domain_index, date_time_str, time_period, metrics=metrics,
+                                       merge_workers=merge_workers)
+        phases.timed('window', window)
+        counters = metrics.counters()
+        phases.count('window', counters.get('files_parsed', 0), counters.get('bytes_merged', 0))
+
+        # Span totals add up every worker's time, so with merge_workers > 1 merge and tar exceed their wall time
+        spans = metrics.summary()['spans']
+        for name in PIPELINE_SPANS:
+            if name in spans:
+                phases.results[name] = dict(spans[name], seconds=spans[name]['total_seconds'])
+
+        with open(DEFAULT_LOG_PATH) as log_file:
+            logged = sum(1 for _ in log_file)
+        return phases.results, {'files': counters.get('files_parsed', 0), 'groups': counters.get('groups_merged', 0),
+                                'merged_bytes': counters.get('bytes_merged', 0), 'logged': logged}
+    finally:
+        os.chdir(cwd)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, old_report):
+    """Prints new / old seconds for every phase both reports ran at the same scale."""
+    old_runs = {run['scale']: run['phases'] for run in old_report['runs']}
+    print("Against %s:" % (old_report.get('commit') or 'previous run'))
+    for run in report['runs']:
+        old_phases = old_runs.get(run['scale'])
+        if old_phases is None:
+            continue
+        for name, phase in run['phases'].items():
+            old_phase = old_phases.get(name)
+            if old_phase and old_phase['seconds']:
+                print("  %-6s %-20s %6.2fx" % (run['scale'], name, phase['seconds'] / old_phase['seconds']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each fileMapping.py phase on synthetic corpora.")
+    parser.add_argument('--scales', default='10k,100k,1m', help="comma separated: 10k, 100k, 1m or a file count")
+    parser.add_argument('--sizes', default='lognormal:512:1.0', help="file size distribution")
+    parser.add_argument('--skew', type=float, default=1.1, help="Zipf exponent of files per group")
+    parser.add_argument('--keys', type=int, default=2000, help="domain file lines")
+    parser.add_argument('--invalid', type=float, default=0.05, help="share of files with unknown keys")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--merge-workers', type=int, default=1)
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'bench_pipeline'))
+    parser.add_argument('--output', default='bench_pipeline.json')
+    parser.add_argument('--compare', help="earlier output JSON to compare against")
+    args = parser.parse_args()
+
+    settings = {'sizes': args.sizes, 'skew': args.skew, 'keys': args.keys, 'invalid': args.invalid,
+                'seed': args.seed}
+    report = {'commit': git_commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+              'cpus': os.cpu_count(), 'settings': dict(settings, merge_workers=args.merge_workers), 'runs': []}
+
+    for scale in args.scales.split(','):
+        files = SCALES.get(scale.lower()) or int(scale)
+        digest = hashlib.sha1(json.dumps(dict(settings, files=files), sort_keys=True).encode()).hexdigest()[:10]
+        corpus_path = os.path.join(args.workdir, '%d_%s' % (files, digest))
+
+        start = time.perf_counter()
+        generate_corpus(corpus_path, files, settings)
+        print("%s: corpus ready in %.1f s (%s)" % (scale, time.perf_counter() - start, corpus_path))
+
+        phases, totals = run_pipeline(corpus_path, args.merge_workers)
+        report['runs'].append({'scale': scale, 'totals': totals, 'phases': phases})
+        for name, phase in phases.items():
+            print("  %-20s %9.3f s %12s/s" % (name, phase['seconds'],
+                                               '%.0f' % phase['per_second'] if phase.get('per_second') else '-'))
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("Wrote", args.output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark: SQLite counter update throughput per connection profile.
+
+usage: python bench_sqlite_profiles.py [runs] [lines_per_run]
+"""
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from importlib.machinery import SourceFileLoader
+from importlib.util import module_from_spec, spec_from_loader
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+_loader = SourceFileLoader('sqlite_update_counter', os.path.join(HERE, 'SQLite_update_counter'))
+counter = module_from_spec(spec_from_loader(_loader.name, _loader))
+_loader.exec_module(counter)
+
+SOURCE_DB = os.path.join(HERE, 'SQLITE', 'marker.db')
+
+
+def run(profile, runs, lines_per_run, keys, tmp_dir):
+    db_file_path = os.path.join(tmp_dir, '%s.db' % profile)
+    log_file_path = os.path.join(tmp_dir, '%s.log' % profile)
+    shutil.copy(SOURCE_DB, db_file_path)
+    rng = random.Random(11)
+    stamp = 240723000000
+
+    elapsed = 0.0
+    for _ in range(runs):
+        with open(log_file_path, 'a') as log_file:
+            for _ in range(lines_per_run):
+                domain, group = rng.choice(keys)
+                stamp += 1
+                log_file.write('%s_%s_%012d.txt\n' % (domain, group, stamp))
+        start = time.perf_counter()
+        counter.update_database(log_file_path, db_file_path, profile)
+        elapsed += time.perf_counter() - start
+    return runs * lines_per_run / elapsed, runs / elapsed
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    lines_per_run = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    conn = sqlite3.connect(SOURCE_DB)
+    keys = conn.execute('SELECT domain, "groups" FROM resellers').fetchall()
+    conn.close()
+
+    print("%d runs of %d lines against %d resellers" % (runs, lines_per_run, len(keys)))
+    print("%-8s %12s %10s" % ('profile', 'lines/s', 'runs/s'))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for profile in counter.CONNECTION_PROFILES:
+            lines_per_second, runs_per_second = run(profile, runs, lines_per_run, keys, tmp_dir)
+            print("%-8s %12.0f %10.1f" % (profile, lines_per_second, runs_per_second))
+
+
+if __name__ == '__main__':
+    main()
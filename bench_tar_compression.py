@@ -0,0 +1,69 @@
+"""
+Benchmark: bytes saved against CPU time for the lab/metadata tar compression modes.
+
+usage: python bench_tar_compression.py [megabytes]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from merge_engine import open_tar_for_write, resolve_compression, tar_extension
+
+MODES = [
+    (None, None),
+    ('gz', 1), ('gz', 6), ('gz', 9),
+    ('bz2', 9),
+    ('xz', 0), ('xz', 6),
+    ('zst', 3), ('zst', 19),
+]
+
+
+def write_cdr_text(file_path, megabytes):
+    domains = ['8x8439', '10tel411', '42com9', '3star170', '01tel918']
+    groups = ['GB_5_DA6', 'DE_2_DH2', 'FR_1_BWL', 'BE_5_EW0', 'NL_5_DT3']
+    target = megabytes * 1024 * 1024
+    written = 0
+    with open(file_path, 'w') as f:
+        while written < target:
+            line = "%s,%s,%d,+44%010d,+49%010d,%s,%d,%.4f\n" % (
+                random.choice(domains), random.choice(groups), random.randint(1700000000, 1800000000),
+                random.randint(0, 9999999999), random.randint(0, 9999999999),
+                random.choice(['ANSWERED', 'BUSY', 'NO ANSWER', 'FAILED']),
+                random.randint(0, 3600), random.random())
+            f.write(line)
+            written += len(line)
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    random.seed(7)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        merged_file_path = os.path.join(tmp_dir, 'merged.txt')
+        write_cdr_text(merged_file_path, megabytes)
+        plain_size = None
+
+        print("%-6s %5s %12s %8s %9s" % ('mode', 'level', 'bytes', 'saved', 'cpu s'))
+        for compression, level in MODES:
+            if compression is not None and resolve_compression(compression) != compression:
+                print("%-6s %5s skipped: no zstd in this Python's tarfile" % (compression, level))
+                continue
+            tar_file_path = os.path.join(tmp_dir, 'group%s' % tar_extension(compression))
+            start = time.process_time()
+            with open_tar_for_write(tar_file_path, compression, level) as tar:
+                tar.add(merged_file_path, arcname='merged.txt')
+            cpu_time = time.process_time() - start
+
+            size = os.path.getsize(tar_file_path)
+            if plain_size is None:
+                plain_size = size
+            print("%-6s %5s %12d %7.1f%% %9.2f" % (
+                compression or 'none', '-' if level is None else level, size,
+                100.0 * (plain_size - size) / plain_size, cpu_time))
+            os.remove(tar_file_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""Content-hash deduplication of incoming CDR files, before anything is merged."""
+import hashlib
+import mmap
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from file_mover import move_file
+from metrics import span, count
+from worker_pool import bounded_map
+
+DIGEST_SIZE = 16
+DEFAULT_MAX_ENTRIES = 500000
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+
+
+def file_digest(file_path):
+    """BLAKE2b digest of the file's content, hashed from an mmap instead of read() copies."""
+    return _digest_and_size(file_path)[0]
+
+
+def _digest_and_size(file_path):
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:  # An empty file cannot be mapped
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+    return digest.digest(), size
+
+
+class SeenIndex:
+    """Digests of recently seen content with LRU and TTL eviction, persisted as an append-only file."""
+
+    def __init__(self, index_path, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS, clock=time.time):
+        self.index_path = index_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()  # digest -> (seen_at, file name), least recently seen first
+        self._pending = OrderedDict()
+        self._lines = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8', errors='surrogateescape') as index_file:
+                for line in index_file:
+                    self._lines += 1
+                    try:
+                        digest_hex, seen_at, file_name = line.rstrip('\n').split('\t', 2)
+                        digest = bytes.fromhex(digest_hex)
+                        seen_at = float(seen_at)
+                    except ValueError:
+                        continue
+                    self._entries.pop(digest, None)
+                    self._entries[digest] = (seen_at, file_name)
+        except FileNotFoundError:
+            pass
+        self._evict()
+
+    def _evict(self):
+        oldest = self.clock() - self.ttl_seconds
+        while self._entries:
+            digest, (seen_at, _) = next(iter(self._entries.items()))
+            if seen_at >= oldest and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[digest]
+
+    def lookup(self, digest):
+        """The name the content was first seen under, or None. A hit counts as seen again."""
+        entry = self._pending.get(digest) or self._entries.get(digest)
+        if entry is None:
+            return None
+        now = self.clock()
+        if entry[0] < now - self.ttl_seconds:
+            return None
+        self._pending[digest] = (now, entry[1])
+        return entry[1]
+
+    def add(self, digest, file_name):
+        """Records content as seen; it is persisted by the next commit."""
+        self._pending[digest] = (self.clock(), file_name)
+
+    def commit(self):
+        """Appends and fsyncs the pending entries, then evicts and compacts if needed."""
+        if not self._pending:
+            return
+        lines = ''.join('%s\t%.0f\t%s\n' % (digest.hex(), seen_at, file_name)
+                        for digest, (seen_at, file_name) in self._pending.items())
+        index_dir = os.path.dirname(self.index_path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        with open(self.index_path, 'a', encoding='utf-8', errors='surrogateescape') as index_file:
+            index_file.write(lines)
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        self._lines += len(self._pending)
+        for digest, entry in self._pending.items():
+            self._entries.pop(digest, None)
+            self._entries[digest] = entry
+        self._pending.clear()
+        self._evict()
+        if self._lines > 2 * max(len(self._entries), 1000):
+            self._compact()
+
+    def _compact(self):
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8', errors='surrogateescape') as index_file:
+            for digest, (seen_at, file_name) in self._entries.items():
+                index_file.write('%s\t%.0f\t%s\n' % (digest.hex(), seen_at, file_name))
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        os.replace(temp_path, self.index_path)
+        self._lines = len(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DuplicateFilter:
+    """Drops, or quarantines, extract_elements tuples whose source file content is in a SeenIndex."""
+
+    def __init__(self, index, src_dir_path, quarantine_dir_path=None, workers=4, metrics=None, sources_kept=True):
+        self.index = index
+        self.src_dir_path = src_dir_path
+        self.quarantine_dir_path = quarantine_dir_path
+        self.workers = workers
+        self.metrics = metrics
+        self.sources_kept = sources_kept
+        self.duplicates = 0
+        self.duplicate_bytes = 0
+        self.already_processed = 0
+
+    def _hash(self, file_name):
+        src_file_path = os.path.join(self.src_dir_path, file_name)
+        try:
+            with span(self.metrics, 'dedup'):
+                return _digest_and_size(src_file_path)
+        except FileNotFoundError:
+            return None, 0
+
+    def filter(self, elements):
+        """Yields the elements whose content is new, in their original order."""
+        submitted = deque()
+
+        def jobs():
+            for element_tuple in elements:
+                submitted.append(element_tuple)
+                yield ('',) if 'EXCEPTION' in element_tuple else (element_tuple[5],)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            hash_or_skip = lambda file_name: self._hash(file_name) if file_name else (None, 0)
+            for digest, size in bounded_map(executor, hash_or_skip, jobs(), self.workers * 4):
+                element_tuple = submitted.popleft()
+                if digest is None or size == 0:
+                    yield element_tuple  # Every empty file has the same digest, so none is taken for a resend
+                    continue
+                seen_name = self.index.lookup(digest)
+                if seen_name is None:
+                    self.index.add(digest, element_tuple[5])
+                    yield element_tuple
+                    continue
+                if self.sources_kept and seen_name == element_tuple[5]:
+                    self.already_processed += 1
+                    continue
+                self.duplicates += 1
+                self.duplicate_bytes += size
+                count(self.metrics, 'files_duplicate')
+                count(self.metrics, 'bytes_duplicate', size)
+                if self.quarantine_dir_path is not None:
+                    self._quarantine(element_tuple[5])
+
+    def _quarantine(self, file_name):
+        os.makedirs(self.quarantine_dir_path, exist_ok=True)
+        try:
+            move_file(os.path.join(self.src_dir_path, file_name), os.path.join(self.quarantine_dir_path, file_name))
+        except FileNotFoundError:
+            print("Duplicate file does not exist:", os.path.join(self.src_dir_path, file_name))
@@ -0,0 +1,30 @@
+"""Streaming .txt scans of the source/txtFiles drops: os.scandir, handed out in fixed size chunks."""
+import os
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def scan_txt_entries(directory_path):
+    """Yields the os.DirEntry of every .txt file as the directory is read."""
+    with os.scandir(directory_path) as entries:
+        for entry in entries:
+            if entry.name.endswith('.txt'):
+                yield entry
+
+
+def iter_txt_files(directory_path):
+    """Yields .txt file names one by one without building a list."""
+    for entry in scan_txt_entries(directory_path):
+        yield entry.name
+
+
+def iter_txt_file_chunks(directory_path, chunk_size=DEFAULT_CHUNK_SIZE, with_stat=False):
+    """Yields lists of at most chunk_size .txt file names, or (file_name, stat_result) pairs with with_stat."""
+    chunk = []
+    for entry in scan_txt_entries(directory_path):
+        chunk.append((entry.name, entry.stat()) if with_stat else entry.name)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
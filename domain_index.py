@@ -0,0 +1,100 @@
+"""
+Composite-key index over the domain file: each line's key as one tuple, checked with a single lookup.
+
+load_domain_index keeps the parsed index in a pickled sidecar next to the domain file.
+"""
+import hashlib
+import os
+import pickle
+
+# Positions of the key fields in a '/'-split domain line or a '_'-split file name, in key order
+METADATA_FIELDS = (0, 1, 2, 3)  # fileMapping.py: first, second, third, fourth
+DEST_FIELDS = (0, 1, 6, 3)  # destFolders variants: first, second, seventh, fourth
+
+# Bumped whenever the sidecar layout or the key format changes
+CACHE_VERSION = 1
+
+
+def make_key(parts, fields=METADATA_FIELDS):
+    """Builds the (first, second, third, fourth) key; second and fourth are compared upper case."""
+    return parts[fields[0]], parts[fields[1]].upper(), parts[fields[2]], parts[fields[3]].upper()
+
+
+def parse_domain_lines(lines, fields=METADATA_FIELDS):
+    """Builds the frozenset of keys from domain lines."""
+    min_parts = max(fields) + 1
+    keys = set()
+
+    for line in lines:
+        parts = line.strip().split('/')
+        if len(parts) >= min_parts:  # Ensure there are enough parts
+            keys.add(make_key(parts, fields))
+
+    return frozenset(keys)
+
+
+def read_domain_index(file_path, fields=METADATA_FIELDS):
+    """Reads the domain file into a frozenset of keys, one per domain line."""
+    with open(file_path, 'r') as f:
+        return parse_domain_lines(f, fields)
+
+
+def default_cache_path(file_path, fields=METADATA_FIELDS):
+    # The field layout is part of the name: both layouts can be cached for the same domain file
+    return "%s.%s.idx" % (file_path, ''.join(str(field) for field in fields))
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError) as e:
+        print(f"Ignoring unreadable domain index cache {cache_path}: {e}")
+        return None
+
+
+def _write_cache(cache_path, cache):
+    tmp_path = "%s.%d.tmp" % (cache_path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)  # Readers never see a half written sidecar
+    except OSError as e:
+        print(f"Could not write domain index cache {cache_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_domain_index(file_path, fields=METADATA_FIELDS, cache_path=None):
+    """Returns the domain index, from the sidecar unless the domain file's size or content changed."""
+    if cache_path is None:
+        cache_path = default_cache_path(file_path, fields)
+
+    stat = os.stat(file_path)
+    cache = _read_cache(cache_path)
+    if cache is not None and (cache.get('version') != CACHE_VERSION or cache.get('fields') != tuple(fields)):
+        cache = None
+
+    if cache is not None and cache['mtime_ns'] == stat.st_mtime_ns and cache['size'] == stat.st_size:
+        return cache['keys']
+
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.blake2b(data).hexdigest()
+
+    if cache is not None and cache['digest'] == digest:
+        domain_index = cache['keys']
+    else:
+        domain_index = parse_domain_lines(data.decode().splitlines(), fields)
+
+    _write_cache(cache_path, {
+        'version': CACHE_VERSION,
+        'fields': tuple(fields),
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'digest': digest,
+        'keys': domain_index,
+    })
+    return domain_index
@@ -0,0 +1,163 @@
+"""Columnar form of extract_elements output: distinct keys, per-row key codes, a valid bitmap and the names."""
+import struct
+from array import array
+
+from domain_index import METADATA_FIELDS
+from filename_parser import EXCEPTION_KEY, EXTRA_ELEMENT, parse_key
+
+_MAGIC = b'EBT1'
+# magic, rows, distinct keys, key strings bytes, file names bytes
+_HEADER = struct.Struct('<4sQQQQ')
+_SEPARATOR = '\0'
+_ENCODING = 'utf-8'
+_ERRORS = 'surrogateescape'  # Names from os.scandir may not be valid UTF-8
+
+
+def _bitmap(rows):
+    return bytearray((rows + 7) // 8)
+
+
+def _test_bit(bitmap, row):
+    return bitmap[row >> 3] & (1 << (row & 7))
+
+
+def _pack_strings(strings):
+    return _SEPARATOR.join(strings).encode(_ENCODING, _ERRORS)
+
+
+def _unpack_strings(blob, count):
+    if count == 0:
+        return []
+    return bytes(blob).decode(_ENCODING, _ERRORS).split(_SEPARATOR)
+
+
+class ElementBatch:
+    """Dictionary-encoded keys, a validity bitmap and the file names of one batch of rows."""
+
+    __slots__ = ('keys', 'key_codes', 'valid', 'file_names')
+
+    def __init__(self, keys, key_codes, valid, file_names):
+        self.keys = keys
+        self.key_codes = key_codes
+        self.valid = valid
+        self.file_names = file_names
+
+    @classmethod
+    def from_names(cls, file_names, fields=METADATA_FIELDS):
+        """Parses file names straight into columns, with filename_parser's grammar (parse_key)."""
+        keys = []
+        key_index = {}
+        key_codes = array('I')
+        names = list(file_names)
+        valid = _bitmap(len(names))
+
+        for row, file_name in enumerate(names):
+            key = parse_key(file_name, fields)
+            if key is None:
+                key_codes.append(0)  # Ignored: the row's valid bit stays clear
+                continue
+            code = key_index.get(key)
+            if code is None:
+                code = key_index[key] = len(keys)
+                keys.append(key)
+            key_codes.append(code)
+            valid[row >> 3] |= 1 << (row & 7)
+
+        return cls(keys, key_codes, valid, names)
+
+    def __len__(self):
+        return len(self.file_names)
+
+    def is_valid(self, row):
+        return bool(_test_bit(self.valid, row))
+
+    def key(self, row):
+        """The row's key, or the EXCEPTION key for a name with too few fields."""
+        return self.keys[self.key_codes[row]] if _test_bit(self.valid, row) else EXCEPTION_KEY
+
+    def __getitem__(self, row):
+        return self.key(row) + (EXTRA_ELEMENT, self.file_names[row])
+
+    def __iter__(self):
+        """Yields the rows as extract_elements tuples."""
+        keys, valid = self.keys, self.valid
+        for row, (code, file_name) in enumerate(zip(self.key_codes, self.file_names)):
+            key = keys[code] if valid[row >> 3] & (1 << (row & 7)) else EXCEPTION_KEY
+            yield key + (EXTRA_ELEMENT, file_name)
+
+    def column(self, position):
+        """Decodes one key field (0-3) for every row, EXCEPTION for invalid rows."""
+        return [self.key(row)[position] for row in range(len(self))]
+
+    def map_keys(self, fn):
+        """Calls fn once per distinct key; returns the results indexed by key code."""
+        return [fn(key) for key in self.keys]
+
+    def accepted(self, domain_index):
+        """Bitmap of the rows that are valid and whose key is in domain_index."""
+        known = self.map_keys(domain_index.__contains__)
+        accepted = _bitmap(len(self))
+        valid = self.valid
+        for row, code in enumerate(self.key_codes):
+            if known[code] and valid[row >> 3] & (1 << (row & 7)):
+                accepted[row >> 3] |= 1 << (row & 7)
+        return accepted
+
+    def to_bytes(self):
+        """Packs the batch into one buffer that from_bytes reads back."""
+        key_blob = _pack_strings(field for key in self.keys for field in key)
+        name_blob = _pack_strings(self.file_names)
+        key_codes = self.key_codes.tobytes()
+        return b''.join((
+            _HEADER.pack(_MAGIC, len(self), len(self.keys), len(key_blob), len(name_blob)),
+            key_codes, bytes(self.valid), key_blob, name_blob,
+        ))
+
+    @classmethod
+    def from_bytes(cls, buffer):
+        """Reads a batch from a to_bytes buffer; any bytes-like object, e.g. a shared memory view."""
+        buffer = memoryview(buffer)
+        magic, rows, key_count, key_blob_size, name_blob_size = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC:
+            raise ValueError("Not an element batch buffer")
+        offset = _HEADER.size
+
+        key_codes = array('I')
+        key_codes.frombytes(buffer[offset:offset + rows * key_codes.itemsize])
+        offset += rows * key_codes.itemsize
+        valid = bytearray(buffer[offset:offset + (rows + 7) // 8])
+        offset += len(valid)
+        fields = _unpack_strings(buffer[offset:offset + key_blob_size], key_count)
+        offset += key_blob_size
+        file_names = _unpack_strings(buffer[offset:offset + name_blob_size], rows)
+
+        keys = [tuple(fields[i:i + 4]) for i in range(0, len(fields), 4)]
+        return cls(keys, key_codes, valid, file_names)
+
+    def __reduce__(self):
+        # One bytes object instead of a list of strings and tuples
+        return _from_bytes, (self.to_bytes(),)
+
+    def to_shared_memory(self):
+        """Copies the packed batch into a new SharedMemory block; the caller closes and unlinks it."""
+        from multiprocessing import shared_memory
+
+        data = self.to_bytes()
+        block = shared_memory.SharedMemory(create=True, size=len(data))
+        block.buf[:len(data)] = data
+        return block
+
+    @classmethod
+    def from_shared_memory(cls, name):
+        """Reads a batch written by to_shared_memory in another process."""
+        from multiprocessing import shared_memory
+
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            return cls.from_bytes(block.buf)
+        finally:
+            block.close()
+
+
+def _from_bytes(data):
+    return ElementBatch.from_bytes(data)
@@ -8,185 +8,400 @@
 Final working file.
 sraj1-07-23-24
 """
+import functools
 import os
-import shutil
-import tarfile
 from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import sys
 import time
-from threading import Lock
 from datetime import datetime
 
-lock = Lock()
+from dir_scanner import iter_txt_files, iter_txt_file_chunks
+from domain_index import read_domain_index, load_domain_index, METADATA_FIELDS
+from filename_parser import parse_elements
+from async_engine import AsyncFileEngine, make_dir
+from dedup import DuplicateFilter, SeenIndex
+from file_mover import move_file, CreatedDirs
+from live_window import LiveWindow, LIVE_JOURNAL_NAME
+from merge_engine import merge_files, stream_merge_into_tar, open_tar_for_write, tar_extension, resolve_compression
+from metrics import Metrics, span, count
+from processed_log import ProcessedLogWriter, DEFAULT_LOG_PATH
+from run_journal import RunJournal, JOURNAL_NAME
+from watcher import open_watcher
+from worker_pool import bounded_map, AdaptivePool
+
+SEEN_HASHES_PATH = os.path.join('resource', 'seen_hashes.txt')
 
 def fetch_txt_files(directory_path):
-    txt_files = [file_name for file_name in os.listdir(directory_path) if file_name.endswith('.txt')]
-    return txt_files
+    return list(iter_txt_files(directory_path))
 
 def extract_elements(file_names):
-    extracted_elements = []
-    for file_name in file_names:
-        parts = file_name.split('_')
-        if len(parts) >= 7:  # Ensure there are enough parts
-            first_element = parts[0]
-            second_element = parts[1].upper()
-            third_element = parts[2]
-            fourth_element = parts[3].upper()
-            extra_element = 'CDR'
-            extracted_elements.append(
-                (first_element, second_element, third_element, fourth_element, extra_element, file_name))
-        else:
-            # Add to exceptions if format is not correct
-            extracted_elements.append(('EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'CDR', file_name))
-    return extracted_elements
+    return parse_elements(file_names, METADATA_FIELDS)
+
+def timed_extract(file_names, metrics):
+    with span(metrics, 'parse'):
+        elements = extract_elements(file_names)
+    count(metrics, 'files_parsed', len(elements))
+    return elements
 
 def read_domain_file(file_path):
-    first_elements = set()
-    second_elements = set()
-    third_elements = set()
-    fourth_elements = set()
-
-    with open(file_path, 'r') as f:
-        for line in f:
-            parts = line.strip().split('/')
-            if len(parts) >= 4:  # Ensure there are enough parts
-                first_elements.add(parts[0])
-                second_elements.add(parts[1].upper())
-                third_elements.add(parts[2])
-                fourth_elements.add(parts[3].upper())
-
-    return first_elements, second_elements, third_elements, fourth_elements
-
-def create_merged_files_and_tar(base_path, date_time_str, elements):
+    return read_domain_index(file_path, METADATA_FIELDS)
+
+def merged_file_name_for(key, date_time_str):
+    return "%s_%s_%s_%s_%s.txt" % (key[0], key[1], key[2], key[3], date_time_str)
+
+def tar_file_name_for(key, tar_compression=None):
+    return "%s_%s_%s_%s%s" % (key[0], key[1], key[2], key[3], tar_extension(tar_compression))
+
+def merge_and_tar_group(base_path, date_time_str, key, files, stream_to_tar=False,
+                        tar_compression=None, compression_level=None, journal=None, merged=False, metrics=None):
+    """Merges one group's files (skipped when merged) and tars the merged file; returns its path and size."""
+    # Use key for the merged file name and place it directly in the base_path
+    merged_file_name = merged_file_name_for(key, date_time_str)
+    merged_file_path = os.path.join(base_path, merged_file_name)
+    src_file_paths = [os.path.join("source", file_name) for file_name in files]
+
+    tar_file_path = os.path.join(base_path, tar_file_name_for(key, tar_compression))
+
+    if stream_to_tar and not merged:
+        with span(metrics, 'tar'), open_tar_for_write(tar_file_path, tar_compression, compression_level) as tar:
+            size = stream_merge_into_tar(tar, merged_file_name, src_file_paths, merged_file_path)
+        count(metrics, 'bytes_merged', size)
+        if journal is not None:
+            journal.record(merged_file_name, 'merged', 'tarred')
+    else:
+        if not merged:
+            # Sources are copied kernel side, never read into Python memory
+            with span(metrics, 'merge'):
+                size = merge_files(merged_file_path, src_file_paths)
+            count(metrics, 'bytes_merged', size)
+            if journal is not None:
+                journal.record(merged_file_name, 'merged')
+
+        # Create tar file
+        with span(metrics, 'tar'), open_tar_for_write(tar_file_path, tar_compression, compression_level) as tar:
+            tar.add(merged_file_path, arcname=merged_file_name)
+            # print("Added merged file to tar:", merged_file_path)
+            if merged:
+                size = tar.getmember(merged_file_name).size  # From the stat tar.add already made
+        if journal is not None:
+            journal.record(merged_file_name, 'tarred')
+
+    count(metrics, 'groups_merged')
+    return merged_file_path, size
+
+def create_merged_files_and_tar(base_path, date_time_str, elements, stream_to_tar=False,
+                                merge_workers=1, merge_processes=False,
+                                tar_compression=None, compression_level=None, journal=None, metrics=None,
+                                engine='threads', offload_workers=64):
+    """
+    Merges and tars every (first, second, third, fourth) group; returns the merged file paths and {path: size}.
+
+    Groups run on merge_workers threads (processes with merge_processes) or an AsyncFileEngine with engine='async'.
+    """
     file_groups = defaultdict(list)
 
     for element_tuple in elements:
         if 'EXCEPTION' not in element_tuple:
             key = (element_tuple[0], element_tuple[1], element_tuple[2], element_tuple[3])
             file_groups[key].append(element_tuple[5])
+        else:
+            count(metrics, 'files_malformed')
 
-    merged_files = []
-
-    for key, files in file_groups.items():
-        # Use key for the merged file name and place it directly in the base_path
-        merged_file_name = "%s_%s_%s_%s_%s.txt" % (key[0], key[1], key[2], key[3], date_time_str)
-        merged_file_path = os.path.join(base_path, merged_file_name)
-
-        with open(merged_file_path, 'w') as merged_file:
-            for file_name in files:
-                src_file_path = os.path.join("source", file_name)
-                if os.path.exists(src_file_path):
-                    with open(src_file_path, 'r') as f:
-                        merged_file.write(f.read())
-                        merged_file.write('\n---------------------------\n')
-                    # print("Merged file:", src_file_path, "into", merged_file_path)
-                else:
-                    print("Source file does not exist:", src_file_path)
-
-        # Add the merged file to the list
-        merged_files.append(merged_file_path)
-
-        # Create tar file
-        tar_file_name = "%s_%s_%s_%s.tar" % (key[0], key[1], key[2], key[3])
-        tar_file_path = os.path.join(base_path, tar_file_name)
-        with tarfile.open(tar_file_path, "w") as tar:
-            tar.add(merged_file_path, arcname=os.path.basename(merged_file_path))
-            # print("Added merged file to tar:", merged_file_path)
-
-    return merged_files
+    if resolve_compression(tar_compression) != tar_compression:
+        print("zstd is not available in this Python's tarfile, using", resolve_compression(tar_compression))
 
-def process_file(merged_file_path, base_path, domain_elements, date_time_str, time_period):
-    """Processes each merged file and moves it to the appropriate directory. Logs file names."""
-    first_elements, second_elements, third_elements, fourth_elements = domain_elements
-    file_name = os.path.basename(merged_file_path)
-    parts = file_name.split('_')
-    first_element, second_element, third_element, fourth_element = parts[0], parts[1], parts[2], parts[3]
-
-    dest_dir_path = os.path.join(base_path, date_time_str, time_period, first_element)
-    error_dir_path = os.path.join(base_path, date_time_str, time_period, '_Errors')
-    log_file_path = os.path.join('resource', 'processed_files_log.txt')
-
-    # Ensure the log file exists
-    if not os.path.exists('resource'):
-        os.makedirs('resource')
-    
-    # Determine destination directory
-    if first_element not in first_elements or \
-            second_element not in second_elements or \
-            third_element not in third_elements or \
-            fourth_element not in fourth_elements:
-        dest_dir_path = error_dir_path
-        file_logged = False
+    if journal is None:
+        plan = {merged_file_name_for(key, date_time_str): (key, files) for key, files in file_groups.items()}
     else:
-        file_logged = True
-
-    if os.path.exists(merged_file_path):
-        try:
-            with lock:
-                if not os.path.exists(dest_dir_path):
-                    os.makedirs(dest_dir_path)
-                dest_file_path = os.path.join(dest_dir_path, file_name)
-                shutil.move(merged_file_path, dest_file_path)
-                # print("Moved file:", merged_file_path, "to", dest_file_path)
-
-                # Log the file name only if it's not an error file
-                if file_logged:
-                    with open(log_file_path, 'a') as log_file:
-                        log_file.write(f"{file_name}\n")
-                        # print("Logged file name:", file_name)
-
-        except Exception as e:
-            print(f"Error moving file {merged_file_path}: {e}")
-
-def map_files_to_directories(base_path, merged_files, domain_elements, date_time_str, time_period):
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = []
-        for merged_file_path in merged_files:
-            futures.append(executor.submit(process_file, merged_file_path, base_path, domain_elements, date_time_str, time_period))
-        for future in futures:
-            future.result()  # To ensure any raised exceptions are caught
-
-def main():
-    txt_files_path = 'source'  # Path to the directory containing the .txt files
-    base_output_path = 'cdrs'  # Base path where the directories are already created
-    domain_file_path = 'resource/domain_file.txt'  # Path to the domain file
-    tar_file_base_path = 'lab/metadata'  # Base path for the .tar file
+        plan = journal.plan({merged_file_name_for(key, date_time_str): (key, files)
+                             for key, files in file_groups.items()})
+    merged_files = [os.path.join(base_path, group_id) for group_id in plan]
+
+    def done(group_id, step):
+        return journal is not None and journal.done(group_id, step)
+
+    # Process workers cannot share the journal or metrics, so the parent records their groups as they finish
+    use_processes = merge_workers > 1 and merge_processes and engine != 'async'
+    worker_journal = None if use_processes else journal
+    worker_metrics = None if use_processes else metrics
+    jobs = [(base_path, date_time_str, key, files, stream_to_tar, tar_compression, compression_level,
+             worker_journal, done(group_id, 'merged'), worker_metrics)
+            for group_id, (key, files) in plan.items() if not done(group_id, 'tarred')]
+
+    merged_sizes = {}
+
+    if engine == 'async':
+        def merge_group(*job):
+            merged_file_path, size = merge_and_tar_group(*job)
+            merged_sizes[merged_file_path] = size
+
+        # Each group writes its own merged file and tar, so groups are ordered by merged file only
+        AsyncFileEngine(offload_workers).run((os.path.join(base_path, merged_file_name_for(job[2], date_time_str)),
+                                              merge_group, job) for job in jobs)
+        return merged_files, merged_sizes
+
+    if merge_workers <= 1:
+        for job in jobs:
+            merged_file_path, size = merge_and_tar_group(*job)
+            merged_sizes[merged_file_path] = size
+        return merged_files, merged_sizes
+
+    executor_class = ProcessPoolExecutor if merge_processes else ThreadPoolExecutor
+    with executor_class(max_workers=merge_workers) as executor:
+        for merged_file_path, size in bounded_map(executor, merge_and_tar_group, jobs,
+                                                  max_pending=merge_workers * 2):
+            merged_sizes[merged_file_path] = size
+            if journal is not None and worker_journal is None:
+                journal.record(os.path.basename(merged_file_path), 'merged', 'tarred')
+            if worker_metrics is None:
+                count(metrics, 'groups_merged')
+    return merged_files, merged_sizes
+
+def destination_dir(file_name, base_path, domain_index, date_time_str, time_period):
+    """Returns the directory a merged file is routed to and whether it is logged as processed."""
+    parts = file_name.split('_')
+    if tuple(parts[:4]) not in domain_index:
+        return os.path.join(base_path, date_time_str, time_period, '_Errors'), False
+    return os.path.join(base_path, date_time_str, time_period, parts[0]), True
 
-    current_time = datetime.now()
+def process_file(merged_file_path, dest_dir_path, file_logged, log_writer, journal=None, metrics=None, size=0):
+    """Moves one merged file (of size bytes, as merged) into its pre-created directory. Logs file names."""
+    file_name = os.path.basename(merged_file_path)
+    dest_file_path = os.path.join(dest_dir_path, file_name)
+    try:
+        # The planning pass already created dest_dir_path, so this is a single rename
+        with span(metrics, 'move'):
+            move_file(merged_file_path, dest_file_path)
+        count(metrics, 'files_moved')
+        count(metrics, 'bytes_moved', size)
+        # print("Moved file:", merged_file_path, "to", dest_file_path)
+
+    except FileNotFoundError:
+        # A run that crashed right after the move left no 'moved' record
+        if journal is None or not os.path.exists(dest_file_path):
+            print(f"Merged file does not exist: {merged_file_path}")
+            return
+    except Exception as e:
+        print(f"Error moving file {merged_file_path}: {e}")
+        return
+
+    if journal is not None:
+        journal.record(file_name, 'moved')
+    # Log the file name only if it's not an error file; the log writer batches the writes
+    if file_logged:
+        log_writer.write(file_name)
+
+def map_files_to_directories(base_path, merged_files, domain_index, date_time_str, time_period,
+                             log_file_path=DEFAULT_LOG_PATH, journal=None, metrics=None,
+                             engine='threads', offload_workers=64, file_sizes=None):
+    """Moves every merged file into its cdrs directory and logs the routed ones."""
+    # Planning pass: route every file, then create each distinct directory once
+    with span(metrics, 'validate'):
+        routes = [(merged_file_path,) + destination_dir(os.path.basename(merged_file_path), base_path,
+                                                        domain_index, date_time_str, time_period)
+                  for merged_file_path in merged_files]
+    rejected = sum(1 for _, _, file_logged in routes if not file_logged)
+    count(metrics, 'groups_routed', len(routes) - rejected)
+    count(metrics, 'groups_rejected', rejected)
+    if engine != 'async':
+        CreatedDirs().ensure_all(dest_dir_path for _, dest_dir_path, _ in routes)
+
+    if journal is not None:
+        # A move takes away the merged file a tar-only rerun reads, so the merge and tar records go to disk first
+        journal.commit()
+    # A name counts as logged only once the log writer has fsynced it; the pending moves are committed with it
+    on_flush = functools.partial(journal.record_many, step='logged', commit=True) if journal is not None else None
+
+    # One writer owns the processed files log; the move workers only queue names for it
+    with ProcessedLogWriter(log_file_path, on_flush=on_flush, metrics=metrics) as log_writer:
+        def jobs():
+            for merged_file_path, dest_dir_path, file_logged in routes:
+                file_name = os.path.basename(merged_file_path)
+                if journal is not None and journal.done(file_name, 'moved'):
+                    # Moved by an interrupted run: only the log line may be missing
+                    if file_logged and not journal.done(file_name, 'logged'):
+                        log_writer.write(file_name)
+                    continue
+                # Replanned for late files: moved again, but logged only if no earlier run did it
+                to_log = file_logged and not (journal is not None and journal.done(file_name, 'logged'))
+                size = file_sizes.get(merged_file_path, 0) if file_sizes is not None else 0
+                yield merged_file_path, dest_dir_path, to_log, log_writer, journal, metrics, size
+
+        if engine == 'async':
+            AsyncFileEngine(offload_workers).run(ordered_moves(jobs()))
+            return
+
+        # Submitted in a bounded window, with as many concurrent moves as the file system rewards
+        with AdaptivePool() as pool:
+            pool.run(process_file, jobs())
+        if metrics is not None:
+            metrics.set('move_workers', pool.workers)
+            metrics.set('move_workers_peak', pool.peak_workers)
+
+def ordered_moves(jobs):
+    """AsyncFileEngine jobs for process_file arguments: a make_dir ahead of the first move into each directory."""
+    created = set()
+    for job in jobs:
+        dest_dir_path = job[1]
+        if dest_dir_path not in created:
+            created.add(dest_dir_path)
+            yield dest_dir_path, make_dir, (dest_dir_path,)
+        yield dest_dir_path, process_file, job
+
+def duplicate_filter(index, date_time_str, quarantine_duplicates, metrics):
+    """A DuplicateFilter over source; quarantined duplicates go to lab/duplicates/<stamp>."""
+    quarantine_dir_path = os.path.join('lab', 'duplicates', date_time_str) if quarantine_duplicates else None
+    return DuplicateFilter(index, 'source', quarantine_dir_path, metrics=metrics)
+
+def current_window(now=None):
+    """Returns (date_time_str, time_period) of the A (071500) or B (151500) window that now falls in."""
+    current_time = now or datetime.now()
     time_A = '071500'
     time_B = '151500'
     time_period = 'B' if current_time.hour >= 15 else 'A'
     date_time_str = "%s%s" % (current_time.strftime('%y%m%d'), time_A if time_period == 'A' else time_B)
+    return date_time_str, time_period
+
+def process_window(elements, domain_index, date_time_str, time_period, base_output_path='cdrs',
+                   tar_file_base_path='lab/metadata', metrics=None, engine='threads', offload_workers=64,
+                   **merge_options):
+    """Merges, tars and routes one window's elements, then writes its metrics next to the journal."""
+    if metrics is None:
+        metrics = Metrics()
 
     # Create the timestamped directory under tar_file_base_path
     timestamped_dir_path = os.path.join(tar_file_base_path, date_time_str)
     if not os.path.exists(timestamped_dir_path):
         os.makedirs(timestamped_dir_path)
 
-    # Fetch and extract data in parallel
-    with ProcessPoolExecutor() as executor:
-        txt_file_names_future = executor.submit(fetch_txt_files, txt_files_path)
-        domain_elements_future = executor.submit(read_domain_file, domain_file_path)
-        extracted_data_future = executor.submit(extract_elements, txt_file_names_future.result())
+    # Every step is journaled, so a rerun of an interrupted window resumes instead of starting over
+    with RunJournal(os.path.join(timestamped_dir_path, JOURNAL_NAME)) as journal:
+        # Create merged files and tar files
+        merged_files, merged_sizes = create_merged_files_and_tar(timestamped_dir_path, date_time_str, elements,
+                                                   journal=journal, metrics=metrics, engine=engine,
+                                                   offload_workers=offload_workers, **merge_options)
 
-    txt_file_names = txt_file_names_future.result()
-    # print("Text files found:", txt_file_names)
+        # Map files to directories
+        map_files_to_directories(base_output_path, merged_files, domain_index, date_time_str, time_period,
+                                 journal=journal, metrics=metrics, engine=engine, offload_workers=offload_workers,
+                                 file_sizes=merged_sizes)
 
-    domain_elements = domain_elements_future.result()
-    extracted_data = extracted_data_future.result()
+    summary_path = os.path.join(timestamped_dir_path, 'metrics_%s.json' % metrics.started.strftime('%H%M%S'))
+    metrics.write_summary(summary_path)
 
-    # for data in extracted_data:
-    #     print(data)
+def main(stream_to_tar=False, merge_workers=1, merge_processes=False,
+         tar_compression=None, compression_level=None, engine='threads', offload_workers=64,
+         dedup=False, quarantine_duplicates=False):
+    txt_files_path = 'source'  # Path to the directory containing the .txt files
+    domain_file_path = 'resource/domain_file.txt'  # Path to the domain file
 
-    # Create merged files and tar files
-    merged_files = create_merged_files_and_tar(timestamped_dir_path, date_time_str, extracted_data)
+    date_time_str, time_period = current_window()
+    metrics = Metrics()
+
+    with span(metrics, 'domain_load'):
+        domain_index = load_domain_index(domain_file_path, METADATA_FIELDS)
+
+    # Names are extracted chunk by chunk as the scan goes, so grouping starts before the scan ends
+    # (scan is timed per chunk)
+    chunks = metrics.iter_spans('scan', iter_txt_file_chunks(txt_files_path))
+    extracted_data = (data for chunk in chunks for data in timed_extract(chunk, metrics))
+
+    # With dedup, files whose content was already seen (a resent drop) are dropped before grouping
+    dup_filter = None
+    if dedup:
+        dup_filter = duplicate_filter(SeenIndex(SEEN_HASHES_PATH), date_time_str, quarantine_duplicates, metrics)
+        extracted_data = dup_filter.filter(extracted_data)
+
+    process_window(extracted_data, domain_index, date_time_str, time_period, metrics=metrics,
+                   stream_to_tar=stream_to_tar, merge_workers=merge_workers, merge_processes=merge_processes,
+                   tar_compression=tar_compression, compression_level=compression_level,
+                   engine=engine, offload_workers=offload_workers)
+
+    if dup_filter is not None:
+        # The new hashes are persisted only now that their files are merged
+        dup_filter.index.commit()
+        print("Skipped %d duplicate files (%.2f MB) and %d already processed files" % (
+            dup_filter.duplicates, dup_filter.duplicate_bytes / (1024 * 1024), dup_filter.already_processed))
+
+def live_route(domain_index, date_time_str, time_period, base_path='cdrs'):
+    """A LiveWindow route: each group's merged file is published to the cdrs directory destination_dir picks for it."""
+    def route(key):
+        merged_file_name = merged_file_name_for(key, date_time_str)
+        dest_dir_path, file_logged = destination_dir(merged_file_name, base_path, domain_index,
+                                                     date_time_str, time_period)
+        return os.path.join(dest_dir_path, merged_file_name), file_logged
+    return route
+
+def open_live_window(domain_index, date_time_str, time_period, metrics, tar_compression=None,
+                     compression_level=None, tar_file_base_path='lab/metadata'):
+    """A LiveWindow for one window, journaled and tarred in lab/metadata/<stamp> (resumed if the journal is there)."""
+    timestamped_dir_path = os.path.join(tar_file_base_path, date_time_str)
+    os.makedirs(timestamped_dir_path, exist_ok=True)
+    return LiveWindow(os.path.join(timestamped_dir_path, LIVE_JOURNAL_NAME),
+                      live_route(domain_index, date_time_str, time_period), metrics=metrics,
+                      tar_name=lambda key: tar_file_name_for(key, tar_compression),
+                      tar_compression=tar_compression, compression_level=compression_level)
+
+def close_live_window(live_window, date_time_str, tar_file_base_path='lab/metadata'):
+    """Closes a window's LiveWindow and writes its metrics into lab/metadata/<stamp>."""
+    live_window.close()
+    metrics = live_window.metrics
+    count(metrics, 'groups_merged', len(live_window.groups()))
+    summary_path = os.path.join(tar_file_base_path, date_time_str,
+                                'metrics_%s.json' % metrics.started.strftime('%H%M%S'))
+    metrics.write_summary(summary_path)
+
+def watch(interval=0.5, stop=None, use_inotify=True, dedup=False, quarantine_duplicates=False,
+          tar_compression=None, compression_level=None):
+    """Merges each file into its group as it lands in source and publishes the window with live_window."""
+    txt_files_path = 'source'  # Path to the directory containing the .txt files
+    domain_file_path = 'resource/domain_file.txt'  # Path to the domain file
 
-    # Map files to directories
-    map_files_to_directories(base_output_path, merged_files, domain_elements, date_time_str, time_period)
+    domain_index = load_domain_index(domain_file_path, METADATA_FIELDS)
+    window = current_window()
+    metrics = Metrics()
+    live_window = open_live_window(domain_index, *window, metrics, tar_compression, compression_level)
+    index = SeenIndex(SEEN_HASHES_PATH) if dedup else None
+    dup_filter = duplicate_filter(index, window[0], quarantine_duplicates, metrics) if dedup else None
+
+    with open_watcher(txt_files_path, interval, use_inotify) as watcher:
+        try:
+            while stop is None or not stop.is_set():
+                names = watcher.poll(interval)
+                if current_window() != window:
+                    close_live_window(live_window, window[0])
+                    metrics = Metrics()
+                    window = current_window()
+                    domain_index = load_domain_index(domain_file_path, METADATA_FIELDS)
+                    live_window = open_live_window(domain_index, *window, metrics, tar_compression, compression_level)
+                    if dedup:
+                        dup_filter = duplicate_filter(index, window[0], quarantine_duplicates, metrics)
+                if not names:
+                    continue
+                elements = timed_extract(names, metrics)
+                live_window.add(dup_filter.filter(elements) if dedup else elements)
+                if index is not None:
+                    # The new hashes are persisted only now that their files are merged
+                    index.commit()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            close_live_window(live_window, window[0])
 
 if __name__ == '__main__':
-    print("-------------------Executing...")
-    start_time = time.time()  # Record the start time
-    main()
-    end_time = time.time()  # Record the end time
-    print("-------------------Time taken: {:.2f} seconds------------".format(end_time - start_time))
+    # --async moves and merges through the asyncio engine, for cdrs and lab/metadata on NFS (batch runs only;
+    # --watch appends each file to its merged file as it lands)
+    engine = 'async' if '--async' in sys.argv[1:] else 'threads'
+    # --dedup skips files whose content was already processed, --quarantine also moves them out of source
+    dedup = '--dedup' in sys.argv[1:] or '--quarantine' in sys.argv[1:]
+    quarantine_duplicates = '--quarantine' in sys.argv[1:]
+    if '--watch' in sys.argv[1:]:
+        print("-------------------Watching source...")
+        watch(dedup=dedup, quarantine_duplicates=quarantine_duplicates)
+    else:
+        print("-------------------Executing...")
+        start_time = time.time()  # Record the start time
+        main(engine=engine, dedup=dedup, quarantine_duplicates=quarantine_duplicates)
+        end_time = time.time()  # Record the end time
+        print("-------------------Time taken: {:.2f} seconds------------".format(end_time - start_time))
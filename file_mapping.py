@@ -2,67 +2,33 @@ import os
 import shutil
 import time
 
+from dir_scanner import iter_txt_files, iter_txt_file_chunks
+from domain_index import read_domain_index, DEST_FIELDS
+from filename_parser import parse_elements
+
 
 def fetch_txt_files(directory_path):
-    txt_files = []
-    for file_name in os.listdir(directory_path):
-        if file_name.endswith('.txt'):
-            txt_files.append(file_name)
-    return txt_files
+    return list(iter_txt_files(directory_path))
 
 
 def extract_elements(file_names):
-    extracted_elements = []
-    for file_name in file_names:
-        parts = file_name.split('_')
-        if len(parts) >= 7:  # Ensure there are enough parts
-            first_element = parts[0]
-            second_element = parts[1].upper()
-            fourth_element = parts[3].upper()
-            seventh_element = parts[6]
-            extra_element = 'CDR'
-            extracted_elements.append(
-                (first_element, second_element, seventh_element, fourth_element, extra_element, file_name))
-        else:
-            # Add to exceptions if format is not correct
-            extracted_elements.append(('EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'CDR', file_name))
-    return extracted_elements
+    return parse_elements(file_names, DEST_FIELDS)
 
 
 def read_domain_file(file_path):
-    first_elements = set()
-    second_elements = set()
-    fourth_elements = set()
-    seventh_elements = set()
-
-    with open(file_path, 'r') as f:
-        for line in f:
-            parts = line.strip().split('/')
-            if len(parts) >= 7:
-                first_elements.add(parts[0])
-                second_elements.add(parts[1].upper())
-                fourth_elements.add(parts[3].upper())
-                seventh_elements.add(parts[6])
+    return read_domain_index(file_path, DEST_FIELDS)
 
-    return first_elements, second_elements, fourth_elements, seventh_elements
 
-
-def map_files_to_directories(base_path, txt_files_path, elements, domain_elements):
+def map_files_to_directories(base_path, txt_files_path, elements, domain_index):
     exception_dir_path = os.path.join(base_path, '_Exception')
     if not os.path.exists(exception_dir_path):
         os.makedirs(exception_dir_path)
 
-    first_elements, second_elements, fourth_elements, seventh_elements = domain_elements
-
     for element_tuple in elements:
         file_name = element_tuple[5]
         src_file_path = os.path.join(txt_files_path, file_name)
 
-        if 'EXCEPTION' in element_tuple or \
-                element_tuple[0] not in first_elements or \
-                element_tuple[1] not in second_elements or \
-                element_tuple[2] not in seventh_elements or \
-                element_tuple[3] not in fourth_elements:
+        if 'EXCEPTION' in element_tuple or element_tuple[:4] not in domain_index:
             dest_dir_path = exception_dir_path
         else:
             dest_dir_path = os.path.join(base_path, element_tuple[0], element_tuple[1], element_tuple[2],
@@ -87,15 +53,12 @@ if __name__ == '__main__':
     base_output_path = 'destFolders'  # Base path where the directories are already created
     domain_file_path = 'input/domain_file.txt'  # Path to the domain file
 
-    txt_file_names = fetch_txt_files(txt_files_path)
-    print("Text files found:", txt_file_names)
-
-    extracted_data = extract_elements(txt_file_names)
-    for data in extracted_data:
-        print(data)
+    domain_index = read_domain_file(domain_file_path)
 
-    domain_elements = read_domain_file(domain_file_path)
+    # Names are extracted chunk by chunk as the directory is scanned, so moves start before the scan ends
+    extracted_data = (data for chunk in iter_txt_file_chunks(txt_files_path)
+                      for data in extract_elements(chunk))
 
-    map_files_to_directories(base_output_path, txt_files_path, extracted_data, domain_elements)
+    map_files_to_directories(base_output_path, txt_files_path, extracted_data, domain_index)
     end_time = time.time()  # Record the end time
     print("-------------------Time taken: {:.2f} seconds------------".format(end_time - start_time))
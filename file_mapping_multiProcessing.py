@@ -1,119 +1,128 @@
 import os
-import shutil
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import sys
 import time
 
+from dir_scanner import iter_txt_files, iter_txt_file_chunks
+from domain_index import read_domain_index, load_domain_index, DEST_FIELDS
+from filename_parser import parse_elements, EXTRA_ELEMENT
+from parallel_extract import extract_in_workers, iter_routes
+from file_mover import move_file, CreatedDirs
+from watcher import open_watcher
+from worker_pool import AdaptivePool
+
 
 def fetch_txt_files(directory_path):
-    txt_files = []
-    for file_name in os.listdir(directory_path):
-        if file_name.endswith('.txt'):
-            txt_files.append(file_name)
-    return txt_files
+    return list(iter_txt_files(directory_path))
 
 
 def extract_elements(file_names):
-    extracted_elements = []
-    for file_name in file_names:
-        parts = file_name.split('_')
-        if len(parts) >= 7:  # Ensure there are enough parts
-            first_element = parts[0]
-            second_element = parts[1].upper()
-            fourth_element = parts[3].upper()
-            seventh_element = parts[6]
-            extra_element = 'CDR'
-            extracted_elements.append(
-                (first_element, second_element, seventh_element, fourth_element, extra_element, file_name))
-        else:
-            # Add to exceptions if format is not correct
-            extracted_elements.append(('EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'CDR', file_name))
-    return extracted_elements
+    return parse_elements(file_names, DEST_FIELDS)
 
 
 def read_domain_file(file_path):
-    first_elements = set()
-    second_elements = set()
-    fourth_elements = set()
-    seventh_elements = set()
+    return read_domain_index(file_path, DEST_FIELDS)
+
+
+def key_dir(base_path, key):
+    return os.path.join(base_path, key[0], key[1], key[2], key[3], EXTRA_ELEMENT)
 
-    with open(file_path, 'r') as f:
-        for line in f:
-            parts = line.strip().split('/')
-            if len(parts) >= 7:
-                first_elements.add(parts[0])
-                second_elements.add(parts[1].upper())
-                fourth_elements.add(parts[3].upper())
-                seventh_elements.add(parts[6])
 
-    return first_elements, second_elements, fourth_elements, seventh_elements
+def destination_dir(element_tuple, base_path, domain_index, exception_dir_path):
+    if 'EXCEPTION' in element_tuple or element_tuple[:4] not in domain_index:
+        return exception_dir_path
+    return key_dir(base_path, element_tuple)
 
 
-def process_file(element_tuple, base_path, txt_files_path, domain_elements, exception_dir_path):
-    first_elements, second_elements, fourth_elements, seventh_elements = domain_elements
+def process_file(element_tuple, txt_files_path, dest_dir_path):
     file_name = element_tuple[5]
     src_file_path = os.path.join(txt_files_path, file_name)
 
-    if 'EXCEPTION' in element_tuple or \
-            element_tuple[0] not in first_elements or \
-            element_tuple[1] not in second_elements or \
-            element_tuple[2] not in seventh_elements or \
-            element_tuple[3] not in fourth_elements:
-        dest_dir_path = exception_dir_path
-    else:
-        dest_dir_path = os.path.join(base_path, element_tuple[0], element_tuple[1], element_tuple[2],
-                                     element_tuple[3], element_tuple[4])
-
-    # Move the file if it exists in the source directory and destination directory is valid
-    if os.path.exists(src_file_path):
-        if os.path.exists(dest_dir_path):
-            dest_file_path = os.path.join(dest_dir_path, file_name)
-            shutil.move(src_file_path, dest_file_path)
-            print("Moved file:", src_file_path, "to", dest_file_path)
-        else:
-            print("Destination directory does not exist:", dest_dir_path)
-            # File remains in the txtFiles directory
-    else:
+    # dest_dir_path was created by the planning pass, so only the source can be missing
+    try:
+        dest_file_path = os.path.join(dest_dir_path, file_name)
+        move_file(src_file_path, dest_file_path)
+        print("Moved file:", src_file_path, "to", dest_file_path)
+    except FileNotFoundError:
         print("Source file does not exist:", src_file_path)
 
 
-def map_files_to_directories(base_path, txt_files_path, elements, domain_elements):
+def map_files_to_directories(base_path, txt_files_path, elements, domain_index):
     exception_dir_path = os.path.join(base_path, '_Exception')
-    if not os.path.exists(exception_dir_path):
-        os.makedirs(exception_dir_path)
+    move_routed(txt_files_path, ((element_tuple, destination_dir(element_tuple, base_path, domain_index,
+                                                                 exception_dir_path))
+                                 for element_tuple in elements))
+
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = []
-        for element_tuple in elements:
-            futures.append(executor.submit(process_file, element_tuple, base_path, txt_files_path, domain_elements, exception_dir_path))
-        for future in futures:
-            future.result()  # To ensure any raised exceptions are caught
+def move_routed(txt_files_path, routes):
+    created_dirs = CreatedDirs()
 
+    def jobs():
+        for element_tuple, dest_dir_path in routes:
+            # Each distinct destination is created once, here, before any worker moves into it
+            created_dirs.ensure(dest_dir_path)
+            yield element_tuple, txt_files_path, dest_dir_path
 
-def main():
+    # Submitted in a bounded window, with the concurrency measured as the moves run
+    with AdaptivePool() as pool:
+        pool.run(process_file, jobs())
+    print("Move workers:", pool.workers, "(peak %d)" % pool.peak_workers)
+
+
+def main(extract_workers=0):
     txt_files_path = 'txtFiles'  # Path to the directory containing the .txt files
     base_output_path = 'destFolders'  # Base path where the directories are already created
     domain_file_path = 'input/domain_file.txt'  # Path to the domain file
 
-    # Fetch and extract data in parallel
-    with ProcessPoolExecutor() as executor:
-        txt_file_names_future = executor.submit(fetch_txt_files, txt_files_path)
-        domain_elements_future = executor.submit(read_domain_file, domain_file_path)
-        extracted_data_future = executor.submit(extract_elements, txt_file_names_future.result())
+    # Names are extracted chunk by chunk as the directory is scanned, so moves start before the scan ends;
+    # with extract_workers the chunks are parsed and validated in that many worker processes, and routed
+    # once per distinct key here (off by default: on one CPU bench_parallel_extract.py measured it slower)
+    if extract_workers:
+        results = extract_in_workers(iter_txt_file_chunks(txt_files_path), domain_file_path, DEST_FIELDS,
+                                     workers=extract_workers)
+        move_routed(txt_files_path, iter_routes(results, lambda key: key_dir(base_output_path, key),
+                                                os.path.join(base_output_path, '_Exception')))
+        return
 
-    txt_file_names = txt_file_names_future.result()
-    print("Text files found:", txt_file_names)
+    domain_index = load_domain_index(domain_file_path, DEST_FIELDS)
+    extracted_data = (data for chunk in iter_txt_file_chunks(txt_files_path)
+                      for data in extract_elements(chunk))
+    map_files_to_directories(base_output_path, txt_files_path, extracted_data, domain_index)
 
-    domain_elements = domain_elements_future.result()
-    extracted_data = extracted_data_future.result()
 
-    for data in extracted_data:
-        print(data)
+def watch(interval=0.5, stop=None, use_inotify=True):
+    """Long-running mode: routes each file within one poll of it landing in txtFiles, until stop is set or Ctrl+C."""
+    txt_files_path = 'txtFiles'  # Path to the directory containing the .txt files
+    base_output_path = 'destFolders'  # Base path where the directories are already created
+    domain_file_path = 'input/domain_file.txt'  # Path to the domain file
 
-    map_files_to_directories(base_output_path, txt_files_path, extracted_data, domain_elements)
+    domain_index = load_domain_index(domain_file_path, DEST_FIELDS)
+    domain_mtime = os.stat(domain_file_path).st_mtime_ns
+    exception_dir_path = os.path.join(base_output_path, '_Exception')
+    created_dirs = CreatedDirs()
+
+    with open_watcher(txt_files_path, interval, use_inotify) as watcher:
+        try:
+            while stop is None or not stop.is_set():
+                names = watcher.poll(interval)
+                if not names:
+                    continue
+                # Pick up domain file edits without a restart
+                if os.stat(domain_file_path).st_mtime_ns != domain_mtime:
+                    domain_index = load_domain_index(domain_file_path, DEST_FIELDS)
+                    domain_mtime = os.stat(domain_file_path).st_mtime_ns
+                for element_tuple in extract_elements(names):
+                    dest_dir_path = destination_dir(element_tuple, base_output_path, domain_index, exception_dir_path)
+                    created_dirs.ensure(dest_dir_path)
+                    process_file(element_tuple, txt_files_path, dest_dir_path)
+        except KeyboardInterrupt:
+            pass
 
 
 if __name__ == '__main__':
-    start_time = time.time()  # Record the start time
-    main()
-    end_time = time.time()  # Record the end time
-    print("-------------------Time taken: {:.2f} seconds------------".format(end_time - start_time))
+    if sys.argv[1:] == ['--watch']:
+        watch()
+    else:
+        start_time = time.time()  # Record the start time
+        main()
+        end_time = time.time()  # Record the end time
+        print("-------------------Time taken: {:.2f} seconds------------".format(end_time - start_time))
@@ -0,0 +1,100 @@
+"""Lock-free move path for the routing workers, with per-directory locks where steps must not interleave."""
+import errno
+import os
+import shutil
+import threading
+from collections import defaultdict
+
+MOVED = 'moved'
+LEFT_BEHIND = 'left_behind'
+VANISHED = 'vanished'
+
+
+def move_file(src_file_path, dest_file_path):
+    """Atomically renames src to dest; falls back to shutil.move across file systems."""
+    try:
+        os.replace(src_file_path, dest_file_path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src_file_path, dest_file_path)
+
+
+class DirectoryLocks:
+    """One lock per destination directory, created on first use."""
+
+    def __init__(self):
+        self._locks = defaultdict(threading.Lock)
+        self._guard = threading.Lock()
+
+    def get(self, dir_path):
+        with self._guard:
+            return self._locks[dir_path]
+
+
+class CreatedDirs:
+    """Remembers which destination directories this run has already created."""
+
+    def __init__(self):
+        self._created = set()
+
+    def ensure(self, dir_path):
+        if dir_path not in self._created:
+            os.makedirs(dir_path, exist_ok=True)
+            self._created.add(dir_path)
+
+    def ensure_all(self, dir_paths):
+        for dir_path in sorted(set(dir_paths)):
+            self.ensure(dir_path)
+
+    def __len__(self):
+        return len(self._created)
+
+
+class MoveTally:
+    """Counts and byte totals of one run's moves, recorded by the thread collecting the move results."""
+
+    def __init__(self, exception_dir_path, keep_names=False):
+        self.exception_dir_path = exception_dir_path
+        self.routed = 0
+        self.routed_bytes = 0
+        self.exceptions = 0
+        self.exception_bytes = 0
+        self.left_behind = 0
+        self.left_behind_bytes = 0
+        self.vanished = 0
+        self.vanished_bytes = 0
+        self._names = defaultdict(list) if keep_names else None
+
+    def record(self, dest_dir_path, file_name, size, outcome):
+        """Counts one move's outcome (MOVED, LEFT_BEHIND or VANISHED)."""
+        if outcome == LEFT_BEHIND:
+            self.left_behind += 1
+            self.left_behind_bytes += size
+            return
+        if outcome == VANISHED:
+            self.vanished += 1
+            self.vanished_bytes += size
+            return
+        if dest_dir_path == self.exception_dir_path:
+            self.exceptions += 1
+            self.exception_bytes += size
+        else:
+            self.routed += 1
+            self.routed_bytes += size
+        if self._names is not None:
+            self._names[dest_dir_path].append(file_name)
+
+    def verify(self):
+        """Lists the paths recorded as moved that are missing from their directory."""
+        if self._names is None:
+            raise ValueError("MoveTally was created without keep_names")
+        missing = []
+        for dest_dir_path, file_names in sorted(self._names.items()):
+            try:
+                present = {entry.name for entry in os.scandir(dest_dir_path)}
+            except FileNotFoundError:
+                present = set()
+            missing.extend(os.path.join(dest_dir_path, file_name)
+                           for file_name in file_names if file_name not in present)
+        return missing
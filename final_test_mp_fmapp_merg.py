@@ -3,140 +3,140 @@ this file is in case when server allocated space is too low.
 '''
 
 import os
-import shutil
-from concurrent.futures import ThreadPoolExecutor
-import threading
+import sys
 import time
 
+from dir_scanner import iter_txt_files, iter_txt_file_chunks
+from domain_index import read_domain_index, load_domain_index, DEST_FIELDS
+from filename_parser import parse_elements
+from file_mover import move_file, DirectoryLocks, CreatedDirs
+from append_plan import group_by_destination, merge_into_destination
+from dedup import DuplicateFilter, SeenIndex
+from worker_pool import AdaptivePool
+
 # Function to fetch .txt files from a directory
 def fetch_txt_files(directory_path):
-    txt_files = []
-    for file_name in os.listdir(directory_path):
-        if file_name.endswith('.txt'):
-            txt_files.append(file_name)
-    return txt_files
+    return list(iter_txt_files(directory_path))
 
 # Function to extract elements from file names
 def extract_elements(file_names):
-    extracted_elements = []
-    for file_name in file_names:
-        parts = file_name.split('_')
-        if len(parts) >= 7:  # Ensure there are enough parts
-            first_element = parts[0]
-            second_element = parts[1].upper()
-            fourth_element = parts[3].upper()
-            seventh_element = parts[6]
-            extra_element = 'CDR'
-            extracted_elements.append(
-                (first_element, second_element, seventh_element, fourth_element, extra_element, file_name))
-        else:
-            # Add to exceptions if format is not correct
-            extracted_elements.append(('EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'CDR', file_name))
-    return extracted_elements
+    return parse_elements(file_names, DEST_FIELDS)
 
 # Function to read the domain file
 def read_domain_file(file_path):
-    first_elements = set()
-    second_elements = set()
-    fourth_elements = set()
-    seventh_elements = set()
-
-    with open(file_path, 'r') as f:
-        for line in f:
-            parts = line.strip().split('/')
-            if len(parts) >= 7:
-                first_elements.add(parts[0])
-                second_elements.add(parts[1].upper())
-                fourth_elements.add(parts[3].upper())
-                seventh_elements.add(parts[6])
-
-    return first_elements, second_elements, fourth_elements, seventh_elements
+    return read_domain_index(file_path, DEST_FIELDS)
+
+# Function to route a file to its destination directory
+def destination_dir(element_tuple, base_path, domain_index, exception_dir_path):
+    if 'EXCEPTION' in element_tuple or element_tuple[:4] not in domain_index:
+        return exception_dir_path
+    return os.path.join(base_path, element_tuple[0], element_tuple[1], element_tuple[2],
+                        element_tuple[3], element_tuple[4])
 
 # Function to process a file
-def process_file(element_tuple, base_path, txt_files_path, domain_elements, exception_dir_path, lock):
-    first_elements, second_elements, fourth_elements, seventh_elements = domain_elements
+def process_file(element_tuple, dest_dir_path, txt_files_path, dir_locks):
     file_name = element_tuple[5]
     src_file_path = os.path.join(txt_files_path, file_name)
 
-    if 'EXCEPTION' in element_tuple or \
-            element_tuple[0] not in first_elements or \
-            element_tuple[1] not in second_elements or \
-            element_tuple[2] not in seventh_elements or \
-            element_tuple[3] not in fourth_elements:
-        dest_dir_path = exception_dir_path
-    else:
-        dest_dir_path = os.path.join(base_path, element_tuple[0], element_tuple[1], element_tuple[2],
-                                     element_tuple[3], element_tuple[4])
-
-    # Move the file if it exists in the source directory and destination directory is valid
+    # Move the file if it exists in the source directory; the planning pass already created dest_dir_path
     if os.path.exists(src_file_path):
-        with lock:
-            if os.path.exists(dest_dir_path):
-                dest_file_path = os.path.join(dest_dir_path, file_name)
-                shutil.move(src_file_path, dest_file_path)
-                print("Moved file:", src_file_path, "to", dest_file_path)
-                
-                # Check for existing text files in the destination directory
-                txt_files_in_dest = [f for f in os.listdir(dest_dir_path) if f.endswith('.txt')]
-                if len(txt_files_in_dest) > 1:
-                    txt_files_in_dest.sort()  # Ensure a consistent order
-                    existing_file_path = os.path.join(dest_dir_path, txt_files_in_dest[0])
-                    new_file_path = os.path.join(dest_dir_path, txt_files_in_dest[1])
-
-                    with open(existing_file_path, 'a') as existing_file, open(new_file_path, 'r') as new_file:
-                        existing_file.write('\n---------------------------\n')
-                        existing_file.write(new_file.read())
-
-                    os.remove(new_file_path)
-                    print(f"Merged content of {new_file_path} into {existing_file_path} and deleted {new_file_path}")
-
-            else:
-                print("Destination directory does not exist:", dest_dir_path)
-                # File remains in the txtFiles directory
+        # Only moves into the same directory wait for each other, because of the merge below
+        with dir_locks.get(dest_dir_path):
+            dest_file_path = os.path.join(dest_dir_path, file_name)
+            move_file(src_file_path, dest_file_path)
+            print("Moved file:", src_file_path, "to", dest_file_path)
+
+            # Check for existing text files in the destination directory
+            txt_files_in_dest = [f for f in os.listdir(dest_dir_path) if f.endswith('.txt')]
+            if len(txt_files_in_dest) > 1:
+                txt_files_in_dest.sort()  # Ensure a consistent order
+                existing_file_path = os.path.join(dest_dir_path, txt_files_in_dest[0])
+                new_file_path = os.path.join(dest_dir_path, txt_files_in_dest[1])
+
+                with open(existing_file_path, 'a') as existing_file, open(new_file_path, 'r') as new_file:
+                    existing_file.write('\n---------------------------\n')
+                    existing_file.write(new_file.read())
+
+                os.remove(new_file_path)
+                print(f"Merged content of {new_file_path} into {existing_file_path} and deleted {new_file_path}")
     else:
         print("Source file does not exist:", src_file_path)
 
+# Function to merge one destination's files in a single pass
+def merge_destination(dest_dir_path, src_file_paths):
+    # One pass per destination: the smallest name is the target, every other file is appended and deleted
+    target_path, appended = merge_into_destination(dest_dir_path, src_file_paths)
+    if target_path is not None:
+        print("Merged", appended, "files into", target_path)
+
 # Function to map files to directories
-def map_files_to_directories(base_path, txt_files_path, elements, domain_elements):
+def map_files_to_directories(base_path, txt_files_path, elements, domain_index, grouped=False):
     exception_dir_path = os.path.join(base_path, '_Exception')
     if not os.path.exists(exception_dir_path):
         os.makedirs(exception_dir_path)
 
-    lock = threading.Lock()
-
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = []
+    if grouped:
+        # Group by destination first, then give each destination to one worker, so no locks are needed;
+        # the files are appended in name order instead of arrival order
+        groups = group_by_destination(
+            (os.path.join(txt_files_path, element_tuple[5]),
+             destination_dir(element_tuple, base_path, domain_index, exception_dir_path))
+            for element_tuple in elements)
+        CreatedDirs().ensure_all(groups)
+        with AdaptivePool() as pool:
+            pool.run(merge_destination, groups.items())
+        print("Merge workers:", pool.workers, "(peak %d)" % pool.peak_workers)
+        return
+
+    dir_locks = DirectoryLocks()
+    created_dirs = CreatedDirs()
+
+    def jobs():
         for element_tuple in elements:
-            futures.append(executor.submit(process_file, element_tuple, base_path, txt_files_path, domain_elements, exception_dir_path, lock))
-        for future in futures:
-            future.result()  # To ensure any raised exceptions are caught
+            # Missing destinations are created here, once each, like the grouped mode does
+            dest_dir_path = destination_dir(element_tuple, base_path, domain_index, exception_dir_path)
+            created_dirs.ensure(dest_dir_path)
+            yield element_tuple, dest_dir_path, txt_files_path, dir_locks
+
+    # Submitted in a bounded window instead of one future per file up front
+    with AdaptivePool() as pool:
+        pool.run(process_file, jobs())
+    print("Move workers:", pool.workers, "(peak %d)" % pool.peak_workers)
 
 # Main function
-def main():
+def main(dedup=False, quarantine_duplicates=False, grouped=False):
     txt_files_path = 'txtFiles'  # Path to the directory containing the .txt files
     base_output_path = 'destFolders'  # Base path where the directories are already created
     domain_file_path = 'input/domain_file.txt'  # Path to the domain file
 
-    # Fetch and extract data in parallel
-    with ProcessPoolExecutor() as executor:
-        txt_file_names_future = executor.submit(fetch_txt_files, txt_files_path)
-        domain_elements_future = executor.submit(read_domain_file, domain_file_path)
-        extracted_data_future = executor.submit(extract_elements, txt_file_names_future.result())
+    domain_index = load_domain_index(domain_file_path, DEST_FIELDS)
 
-    txt_file_names = txt_file_names_future.result()
-    print("Text files found:", txt_file_names)
+    # Names are extracted chunk by chunk as the directory is scanned, so moves start before the scan ends
+    extracted_data = (data for chunk in iter_txt_file_chunks(txt_files_path)
+                      for data in extract_elements(chunk))
 
-    domain_elements = domain_elements_future.result()
-    extracted_data = extracted_data_future.result()
+    # With dedup, a resent file is never appended into its destination again;
+    # duplicates stay in txtFiles, or move to destFolders/_Duplicates with quarantine_duplicates
+    dup_filter = None
+    if dedup:
+        quarantine_dir_path = os.path.join(base_output_path, '_Duplicates') if quarantine_duplicates else None
+        # Processed files leave txtFiles, so even a file back under its old name is a resend
+        dup_filter = DuplicateFilter(SeenIndex('input/seen_hashes.txt'), txt_files_path, quarantine_dir_path,
+                                     sources_kept=False)
+        extracted_data = dup_filter.filter(extracted_data)
 
-    for data in extracted_data:
-        print(data)
+    map_files_to_directories(base_output_path, txt_files_path, extracted_data, domain_index, grouped=grouped)
 
-    map_files_to_directories(base_output_path, txt_files_path, extracted_data, domain_elements)
+    if dup_filter is not None:
+        # The new hashes are persisted only now that their files are merged
+        dup_filter.index.commit()
+        print("Skipped", dup_filter.duplicates, "duplicate files")
 
 # Entry point
 if __name__ == '__main__':
     start_time = time.time()  # Record the start time
-    main()
+    main(dedup='--dedup' in sys.argv[1:] or '--quarantine' in sys.argv[1:],
+         quarantine_duplicates='--quarantine' in sys.argv[1:],
+         grouped='--grouped' in sys.argv[1:])
     end_time = time.time()  # Record the end time
     print("-------------------Time taken: {:.2f} seconds------------".format(end_time - start_time))
@@ -0,0 +1,37 @@
+"""Append-only JSON lines files shared by the run and live journals."""
+import json
+import os
+import threading
+
+
+def read_records(journal_path):
+    """Yields the records of journal_path in order, skipping a line torn by a crash; nothing if there is no file."""
+    try:
+        with open(journal_path, 'r') as journal_file:
+            for line in journal_file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        return
+
+
+class JournalFile:
+    """Appends batches of records to a JSON lines file, each written, flushed and fsynced in one go."""
+
+    def __init__(self, journal_path):
+        self._file = open(journal_path, 'a')
+        self._lock = threading.Lock()
+
+    def append(self, records):
+        if not records:
+            return
+        data = ''.join(json.dumps(record) + '\n' for record in records)
+        with self._lock:
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
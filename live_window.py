@@ -0,0 +1,162 @@
+"""Drop-to-destination merging for fileMapping's watch mode, journaled in live.jsonl so a restart resumes it."""
+import os
+import time
+from collections import defaultdict
+
+from file_mover import CreatedDirs
+from jsonl_journal import read_records, JournalFile
+from merge_engine import merge_files, open_tar_for_write
+from metrics import span, count
+from processed_log import ProcessedLogWriter, DEFAULT_LOG_PATH
+
+LIVE_JOURNAL_NAME = 'live.jsonl'
+PART_SUFFIX = '.part'
+
+
+class LiveWindow:
+    """One window's merged files, appended to in cdrs as files land and tarred at most every tar_interval seconds."""
+
+    def __init__(self, journal_path, route, src_dir_path='source', log_file_path=DEFAULT_LOG_PATH, metrics=None,
+                 tar_name=None, tar_compression=None, compression_level=None, tar_interval=60.0):
+        self.journal_path = journal_path
+        self.tar_dir_path = os.path.dirname(journal_path)
+        self.route = route
+        self.src_dir_path = src_dir_path
+        self.metrics = metrics
+        self.tar_name = tar_name
+        self.tar_compression = tar_compression
+        self.compression_level = compression_level
+        self.tar_interval = tar_interval
+        self._groups = {}  # group id (merged file name) -> (key, merged_file_path, file_logged)
+        self._sizes = {}  # group id -> merged file size, once known
+        self._untarred = set()  # Groups appended to since their tar was last written
+        self._tarred_at = None
+        self._names = set()  # Source files appended in this window
+        self._logged = set()
+        self._interrupted = {}  # group id -> 'appending' record of a batch a crash cut short
+        self._dirs = CreatedDirs()
+        self._load()
+        self._file = JournalFile(journal_path)
+        self._log_writer = ProcessedLogWriter(log_file_path, on_flush=self._record_logged, metrics=metrics)
+        self._recover()
+
+    def _load(self):
+        for record in read_records(self.journal_path):
+            group_id = record['id']
+            if record['step'] == 'appending':
+                self._groups[group_id] = (tuple(record['key']), record['dest'], record['log'])
+                self._names.update(record['files'])
+                self._interrupted[group_id] = record
+            elif record['step'] == 'appended':
+                self._interrupted.pop(group_id, None)
+            elif record['step'] == 'logged':
+                self._logged.add(group_id)
+
+    def _recover(self):
+        records = list(self._interrupted.values())
+        for record in records:
+            # Drop whatever part of the batch made it to disk before appending all of it again
+            try:
+                os.truncate(record['dest'], record['size'])
+            except FileNotFoundError:
+                pass  # The crash came before the merged file was created
+            self._append_files(record)
+        self._file.append([{'id': record['id'], 'step': 'appended'} for record in records])
+        self._interrupted.clear()
+        # A crash may have come before a group's log line or its last tar
+        self._untarred.update(self._groups)
+        for group_id in self._groups:
+            self._log(group_id)
+
+    def add(self, elements):
+        """Appends the files of elements (extract_elements tuples) to their groups' merged files."""
+        batches = defaultdict(list)
+        for element_tuple in elements:
+            if 'EXCEPTION' in element_tuple:
+                count(self.metrics, 'files_malformed')
+                continue
+            file_name = element_tuple[5]
+            if file_name in self._names:
+                continue  # Reported again (a rewrite, an overflow rescan, a restart): already merged
+            self._names.add(file_name)
+            batches[(element_tuple[0], element_tuple[1], element_tuple[2], element_tuple[3])].append(file_name)
+
+        records = []
+        for key, files in batches.items():
+            merged_file_path, file_logged = self.route(key)
+            group_id = os.path.basename(merged_file_path)
+            self._groups[group_id] = (key, merged_file_path, file_logged)
+            if group_id not in self._sizes:
+                self._sizes[group_id] = _file_size(merged_file_path)
+            records.append({'id': group_id, 'step': 'appending', 'key': list(key), 'dest': merged_file_path,
+                            'log': file_logged, 'size': self._sizes[group_id], 'files': files})
+
+        # Journaled before the first byte is copied, so a crash in between is redone, never repeated
+        self._file.append(records)
+        for record in records:
+            self._append_files(record)
+        self._file.append([{'id': record['id'], 'step': 'appended'} for record in records])
+        for record in records:
+            self._log(record['id'])
+        if self._tarred_at is None or time.monotonic() - self._tarred_at >= self.tar_interval:
+            self._write_tars()
+
+    def _append_files(self, record):
+        src_paths = [os.path.join(self.src_dir_path, file_name) for file_name in record['files']]
+        self._dirs.ensure(os.path.dirname(record['dest']))
+        with span(self.metrics, 'merge'):
+            written = merge_files(record['dest'], src_paths, append=True)
+        self._untarred.add(record['id'])
+        self._sizes[record['id']] = record['size'] + written
+        count(self.metrics, 'bytes_merged', written)
+        count(self.metrics, 'files_merged', len(src_paths))
+
+    def _write_tars(self):
+        self._tarred_at = time.monotonic()
+        if self.tar_name is None:
+            return
+        for group_id in sorted(self._untarred):
+            key, merged_file_path, _ = self._groups[group_id]
+            tar_file_path = os.path.join(self.tar_dir_path, self.tar_name(key))
+            with span(self.metrics, 'tar'):
+                with open_tar_for_write(tar_file_path + PART_SUFFIX, self.tar_compression,
+                                        self.compression_level) as tar:
+                    tar.add(merged_file_path, arcname=group_id)
+                os.replace(tar_file_path + PART_SUFFIX, tar_file_path)
+            count(self.metrics, 'bytes_tarred', _file_size(merged_file_path))
+        self._untarred.clear()
+
+    def _log(self, group_id):
+        if self._groups[group_id][2] and group_id not in self._logged:
+            self._logged.add(group_id)
+            self._log_writer.write(group_id)
+
+    def _record_logged(self, batch):
+        self._file.append([{'id': group_id, 'step': 'logged'} for group_id in batch])
+
+    def groups(self):
+        """(key, merged_file_path) of every group appended to in this window, including before a restart."""
+        return [(key, merged_file_path) for key, merged_file_path, _ in self._groups.values()]
+
+    def close(self):
+        """Writes the tars still behind their merged files, waits for the queued log lines and closes the journal."""
+        try:
+            self._write_tars()
+        finally:
+            try:
+                self._log_writer.close()
+            finally:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _file_size(file_path):
+    try:
+        return os.stat(file_path).st_size
+    except FileNotFoundError:
+        return 0
@@ -0,0 +1,269 @@
+"""
+Kernel-side concatenation of CDR files into merged files and tars.
+
+Copies go through os.copy_file_range, then os.sendfile, then one reusable buffer per thread.
+"""
+import errno
+import os
+import tarfile
+import threading
+import time
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Written after every merged source file, as the merge steps always did
+MERGE_SEPARATOR = '\n---------------------------\n'.replace('\n', os.linesep).encode()
+
+# Errors that mean "this kind of copy does not work for these two files", not "the copy failed"
+_FALLBACK_ERRNOS = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+if hasattr(errno, 'ENOTSUP'):
+    _FALLBACK_ERRNOS.add(errno.ENOTSUP)
+
+# compression name -> (tarfile mode, level keyword, file extension)
+TAR_COMPRESSIONS = {
+    None: ('w', None, ''),
+    'gz': ('w:gz', 'compresslevel', '.gz'),
+    'bz2': ('w:bz2', 'compresslevel', '.bz2'),
+    'xz': ('w:xz', 'preset', '.xz'),
+    'zst': ('w:zst', 'level', '.zst'),  # Only where tarfile ships zstd (Python 3.14+)
+}
+# Used for 'zst' when this Python's tarfile has no zstd support
+ZSTD_FALLBACK = 'gz'
+
+# Kernel copy paths still tried; a path set to False falls through to the next one
+KERNEL_COPY = {
+    'copy_file_range': hasattr(os, 'copy_file_range'),
+    'sendfile': hasattr(os, 'sendfile') and os.name == 'posix',
+}
+_buffers = threading.local()
+
+
+def _copy_buffer():
+    buffer = getattr(_buffers, 'buffer', None)
+    if buffer is None:
+        buffer = _buffers.buffer = bytearray(COPY_BUFFER_SIZE)
+    return buffer
+
+
+def write_all(dst_fd, data):
+    """os.write until every byte of data is written."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(dst_fd, view):]
+
+
+def _copy_with(copy_call, method, remaining):
+    # Returns the bytes still to copy, or None if this method is not usable here
+    try:
+        while remaining > 0:
+            copied = copy_call(min(remaining, 1 << 30))
+            if copied == 0:
+                break  # Source shrank, or the file system reports nothing to copy
+            remaining -= copied
+    except OSError as e:
+        if e.errno not in _FALLBACK_ERRNOS:
+            raise
+        if e.errno == errno.ENOSYS:
+            KERNEL_COPY[method] = False  # Not available on this kernel at all
+        return None
+    return remaining
+
+
+if hasattr(os, 'readv'):
+    def _read_into(src_fd, buffer):
+        return os.readv(src_fd, [buffer])
+else:
+    def _read_into(src_fd, buffer):
+        data = os.read(src_fd, len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _buffered_copy(src_fd, dst_fd):
+    buffer = _copy_buffer()
+    view = memoryview(buffer)
+    copied = 0
+    while True:
+        read = _read_into(src_fd, buffer)
+        if not read:
+            return copied
+        write_all(dst_fd, view[:read])
+        copied += read
+
+
+def copy_fd(src_fd, dst_fd):
+    """Appends everything from src_fd's offset onwards at dst_fd's offset, advancing both; returns the bytes copied."""
+    start = os.lseek(src_fd, 0, os.SEEK_CUR)
+    remaining = os.fstat(src_fd).st_size - start
+
+    if remaining > 0 and KERNEL_COPY['copy_file_range']:
+        left = _copy_with(lambda count: os.copy_file_range(src_fd, dst_fd, count), 'copy_file_range', remaining)
+        if left is not None:
+            remaining = left
+    if remaining > 0 and KERNEL_COPY['sendfile']:
+        left = _copy_with(lambda count: os.sendfile(dst_fd, src_fd, None, count), 'sendfile', remaining)
+        if left is not None:
+            remaining = left
+
+    # Whatever the kernel did not copy, plus anything appended since the fstat
+    _buffered_copy(src_fd, dst_fd)
+    return os.lseek(src_fd, 0, os.SEEK_CUR) - start
+
+
+def append_file(src_path, dst_fd):
+    """Appends the whole of src_path at dst_fd's offset; returns the bytes copied."""
+    src_fd = os.open(src_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        return copy_fd(src_fd, dst_fd)
+    finally:
+        os.close(src_fd)
+
+
+def merge_files(merged_file_path, src_paths, separator=MERGE_SEPARATOR, append=False):
+    """Writes (with append, adds) each existing file of src_paths and a separator; returns bytes written."""
+    written = 0
+    truncate = 0 if append else os.O_TRUNC
+    dst_fd = os.open(merged_file_path, os.O_WRONLY | os.O_CREAT | truncate | getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        if append:
+            # Seek instead of O_APPEND: copy_file_range refuses a target opened for append
+            os.lseek(dst_fd, 0, os.SEEK_END)
+        for src_path in src_paths:
+            try:
+                written += append_file(src_path, dst_fd)
+            except FileNotFoundError:
+                print("Source file does not exist:", src_path)
+                continue
+            write_all(dst_fd, separator)
+            written += len(separator)
+    finally:
+        os.close(dst_fd)
+    return written
+
+
+def append_and_consume(target_path, src_paths, separator=MERGE_SEPARATOR):
+    """Appends separator and each existing file of src_paths to target_path, deleting each source once copied."""
+    appended = 0
+    dst_fd = os.open(target_path, os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        # Seek instead of O_APPEND: copy_file_range refuses a target opened for append
+        os.lseek(dst_fd, 0, os.SEEK_END)
+        for src_path in src_paths:
+            try:
+                src_fd = os.open(src_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+            except FileNotFoundError:
+                print("Source file does not exist:", src_path)
+                continue
+            try:
+                write_all(dst_fd, separator)
+                copy_fd(src_fd, dst_fd)
+            finally:
+                os.close(src_fd)
+            os.remove(src_path)
+            appended += 1
+    finally:
+        os.close(dst_fd)
+    return appended
+
+
+class GroupStream:
+    """Read-only file object over a group's sources, each followed by separator, sized up front; tees to tee_fd."""
+
+    def __init__(self, src_paths, separator=MERGE_SEPARATOR, tee_fd=None):
+        self.separator = separator
+        self.tee_fd = tee_fd
+        self.parts = []
+        for src_path in src_paths:
+            try:
+                self.parts.append((src_path, os.stat(src_path).st_size))
+            except FileNotFoundError:
+                print("Source file does not exist:", src_path)
+        self.size = sum(size + len(separator) for _, size in self.parts)
+        self._index = 0
+        self._src = None
+        self._left = 0
+        self._pending = b''
+
+    def _next_chunk(self, size):
+        if self._pending:
+            chunk, self._pending = self._pending[:size], self._pending[size:]
+            return chunk
+        if self._src is None:
+            if self._index >= len(self.parts):
+                return b''
+            src_path, self._left = self.parts[self._index]
+            self._src = open(src_path, 'rb')
+        if self._left > 0:
+            chunk = self._src.read(min(size, self._left))
+            if not chunk:
+                self.close()
+                raise OSError("Source file shrank while merging: %s" % self.parts[self._index][0])
+            self._left -= len(chunk)
+            return chunk
+        self._src.close()
+        self._src = None
+        self._index += 1
+        self._pending = self.separator
+        return self._next_chunk(size)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size
+        chunks = []
+        wanted = size
+        while wanted > 0:
+            chunk = self._next_chunk(min(wanted, COPY_BUFFER_SIZE))
+            if not chunk:
+                break
+            chunks.append(chunk)
+            wanted -= len(chunk)
+        data = b''.join(chunks)
+        if self.tee_fd is not None and data:
+            write_all(self.tee_fd, data)
+        return data
+
+    def close(self):
+        if self._src is not None:
+            self._src.close()
+            self._src = None
+
+
+def stream_merge_into_tar(tar, arcname, src_paths, merged_file_path=None, separator=MERGE_SEPARATOR):
+    """Adds src_paths merged as one tar member, reading each source once; returns its size."""
+    tee_fd = None
+    if merged_file_path is not None:
+        tee_fd = os.open(merged_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+    stream = GroupStream(src_paths, separator, tee_fd)
+    try:
+        tarinfo = tarfile.TarInfo(arcname)
+        tarinfo.size = stream.size
+        tarinfo.mtime = time.time()
+        tarinfo.mode = 0o644
+        tar.addfile(tarinfo, stream)
+    finally:
+        stream.close()
+        if tee_fd is not None:
+            os.close(tee_fd)
+    return stream.size
+
+
+def resolve_compression(compression):
+    """Returns the compression that will actually be used for the requested one."""
+    if compression not in TAR_COMPRESSIONS:
+        raise ValueError("Unknown tar compression: %r" % (compression,))
+    if compression == 'zst' and 'zst' not in tarfile.TarFile.OPEN_METH:
+        return ZSTD_FALLBACK
+    return compression
+
+
+def tar_extension(compression):
+    return '.tar' + TAR_COMPRESSIONS[resolve_compression(compression)][2]
+
+
+def open_tar_for_write(tar_file_path, compression=None, level=None):
+    """Opens tar_file_path for writing, compressed as requested; level None keeps the codec default."""
+    mode, level_keyword, _ = TAR_COMPRESSIONS[resolve_compression(compression)]
+    kwargs = {}
+    if level is not None and level_keyword is not None:
+        kwargs[level_keyword] = level
+    return tarfile.open(tar_file_path, mode, **kwargs)
@@ -0,0 +1,200 @@
+"""In-memory run metrics: timed spans, counters and gauges, summarized to JSON at the end of a run."""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+_BUCKETS = 65  # int.bit_length() of any duration in ns below 2**64
+
+
+class Histogram:
+    """Power-of-two buckets of nanosecond durations, with exact count, total, min and max."""
+
+    __slots__ = ('buckets', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, ns):
+        self.buckets[ns.bit_length()] += 1
+        self.count += 1
+        self.total += ns
+        if self.min is None or ns < self.min:
+            self.min = ns
+        if ns > self.max:
+            self.max = ns
+
+    def merge(self, other):
+        for bucket, hits in enumerate(other.buckets):
+            self.buckets[bucket] += hits
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of the samples, capped at max."""
+        wanted = fraction * self.count
+        seen = 0
+        for bucket, hits in enumerate(self.buckets):
+            seen += hits
+            if hits and seen >= wanted:
+                return min((1 << bucket) - 1, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_seconds': self.total / 1e9,
+            'mean_us': self.total / self.count / 1e3 if self.count else 0.0,
+            'min_us': (self.min or 0) / 1e3,
+            'max_us': self.max / 1e3,
+            'p50_us': self.percentile(0.50) / 1e3,
+            'p90_us': self.percentile(0.90) / 1e3,
+            'p99_us': self.percentile(0.99) / 1e3,
+        }
+
+
+class _Shard:
+    __slots__ = ('histograms', 'counters')
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+
+
+class _Span:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.observe(self.name, time.perf_counter_ns() - self.start)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Metrics:
+    """Spans and counters of one run, aggregated per thread and merged on summary()."""
+
+    def __init__(self):
+        self.started = datetime.now()
+        self._start_ns = time.perf_counter_ns()
+        self._local = threading.local()
+        self._shards = []
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, name, ns):
+        """Records one duration in nanoseconds into the histogram called name."""
+        histograms = self._shard().histograms
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.record(ns)
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def add(self, name, value=1):
+        counters = self._shard().counters
+        counters[name] = counters.get(name, 0) + value
+
+    def set(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def iter_spans(self, name, iterable):
+        """Yields from iterable, timing each step of it (not the caller's work in between) as name."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter_ns()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(name, time.perf_counter_ns() - start)
+            yield item
+
+    def histograms(self):
+        merged = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for name, histogram in list(shard.histograms.items()):
+                merged.setdefault(name, Histogram()).merge(histogram)
+        return merged
+
+    def counters(self):
+        merged = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for name, value in list(shard.counters.items()):
+                merged[name] = merged.get(name, 0) + value
+        return merged
+
+    def summary(self):
+        wall_seconds = (time.perf_counter_ns() - self._start_ns) / 1e9
+        counters = self.counters()
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'wall_seconds': wall_seconds,
+            'spans': {name: histogram.summary() for name, histogram in sorted(self.histograms().items())},
+            'counters': dict(sorted(counters.items())),
+            'rates': {"%s_per_second" % name: value / wall_seconds if wall_seconds else 0.0
+                      for name, value in sorted(counters.items())},
+            'gauges': dict(sorted(self._gauges.items())),
+        }
+
+    def write_summary(self, file_path):
+        """Writes summary() as JSON to file_path and returns it."""
+        summary = self.summary()
+        summary_dir = os.path.dirname(file_path)
+        if summary_dir:
+            os.makedirs(summary_dir, exist_ok=True)
+        with open(file_path, 'w') as summary_file:
+            json.dump(summary, summary_file, indent=2)
+        return summary
+
+
+def span(metrics, name):
+    """metrics.span(name), or a no-op context when metrics is None."""
+    return _NO_SPAN if metrics is None else _Span(metrics, name)
+
+
+def count(metrics, name, value=1):
+    if metrics is not None:
+        metrics.add(name, value)
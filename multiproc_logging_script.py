@@ -2,104 +2,92 @@ import os
 import shutil
 import time
 import logging
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import sys
+from collections import deque
+
+from dir_scanner import iter_txt_files, iter_txt_file_chunks
+from domain_index import read_domain_index, load_domain_index, DEST_FIELDS
+from filename_parser import parse_elements
+from file_mover import CreatedDirs, MoveTally, MOVED, LEFT_BEHIND, VANISHED
+from worker_pool import AdaptivePool
+from metrics import Metrics, span, count
 
 def fetch_txt_files(directory_path):
-    txt_files = []
-    for file_name in os.listdir(directory_path):
-        if file_name.endswith('.txt'):
-            txt_files.append(file_name)
+    txt_files = list(iter_txt_files(directory_path))
     logging.info("Space complexity of fetch_txt_files: O(n) with n = %d", len(txt_files))
     return txt_files
 
 def extract_elements(file_names):
-    extracted_elements = []
-    for file_name in file_names:
-        parts = file_name.split('_')
-        if len(parts) >= 7:  # Ensure there are enough parts
-            first_element = parts[0]
-            second_element = parts[1].upper()
-            fourth_element = parts[3].upper()
-            seventh_element = parts[6]
-            extra_element = 'CDR'
-            extracted_elements.append(
-                (first_element, second_element, seventh_element, fourth_element, extra_element, file_name))
-        else:
-            # Add to exceptions if format is not correct
-            extracted_elements.append(('EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'CDR', file_name))
+    extracted_elements = parse_elements(file_names, DEST_FIELDS)
     logging.info("Space complexity of extract_elements: O(n) with n = %d", len(extracted_elements))
     return extracted_elements
 
 def read_domain_file(file_path):
-    first_elements = set()
-    second_elements = set()
-    fourth_elements = set()
-    seventh_elements = set()
-
-    with open(file_path, 'r') as f:
-        for line in f:
-            parts = line.strip().split('/')
-            if len(parts) >= 7:
-                first_elements.add(parts[0])
-                second_elements.add(parts[1].upper())
-                fourth_elements.add(parts[3].upper())
-                seventh_elements.add(parts[6])
-
-    logging.info("Space complexity of read_domain_file: O(k) with k = %d", 
-                 len(first_elements) + len(second_elements) + len(fourth_elements) + len(seventh_elements))
-    return first_elements, second_elements, fourth_elements, seventh_elements
-
-def process_file(element_tuple, base_path, txt_files_path, domain_elements, exception_dir_path, loop_count):
-    first_elements, second_elements, fourth_elements, seventh_elements = domain_elements
+    domain_index = read_domain_index(file_path, DEST_FIELDS)
+    logging.info("Space complexity of read_domain_file: O(k) with k = %d", len(domain_index))
+    return domain_index
+
+def destination_dir(element_tuple, base_path, domain_index, exception_dir_path):
+    if 'EXCEPTION' in element_tuple or element_tuple[:4] not in domain_index:
+        return exception_dir_path
+    return os.path.join(base_path, element_tuple[0], element_tuple[1], element_tuple[2],
+                        element_tuple[3], element_tuple[4])
+
+def process_file(element_tuple, txt_files_path, dest_dir_path, loop_count, size=0, metrics=None):
+    """Moves one file into its pre-created directory. Returns MOVED, LEFT_BEHIND or VANISHED."""
     file_name = element_tuple[5]
     src_file_path = os.path.join(txt_files_path, file_name)
 
-    if 'EXCEPTION' in element_tuple or \
-            element_tuple[0] not in first_elements or \
-            element_tuple[1] not in second_elements or \
-            element_tuple[2] not in seventh_elements or \
-            element_tuple[3] not in fourth_elements:
-        dest_dir_path = exception_dir_path
-    else:
-        dest_dir_path = os.path.join(base_path, element_tuple[0], element_tuple[1], element_tuple[2],
-                                     element_tuple[3], element_tuple[4])
-
-    # Move the file if it exists in the source directory and destination directory is valid
-    if os.path.exists(src_file_path):
-        if os.path.exists(dest_dir_path):
-            start_time = time.time()  # Record start time
-            dest_file_path = os.path.join(dest_dir_path, file_name)
+    # dest_dir_path was created by the planning pass, so only the source can be missing
+    try:
+        dest_file_path = os.path.join(dest_dir_path, file_name)
+        # Move times go into the run's 'move' histogram; per file lines are only logged at DEBUG
+        with span(metrics, 'move'):
             shutil.move(src_file_path, dest_file_path)
-            end_time = time.time()  # Record end time
-            logging.info("Loop #%d: Moved file: %s to %s. Time taken: %.2f seconds", loop_count, src_file_path, dest_file_path, end_time - start_time)
-        else:
-            logging.error("Destination directory does not exist: %s", dest_dir_path)
-            # File remains in the txtFiles directory
-    else:
-        logging.error("Source file does not exist: %s", src_file_path)
-
-def map_files_to_directories(base_path, txt_files_path, elements, domain_elements):
+        count(metrics, 'files_moved')
+        count(metrics, 'bytes_moved', size)
+        logging.debug("Loop #%d: Moved file: %s to %s", loop_count, src_file_path, dest_file_path)
+        return MOVED
+    except OSError as e:
+        # A failed move costs this file only; the run goes on and the tally reports it
+        if not os.path.exists(src_file_path):
+            logging.error("Source file does not exist: %s", src_file_path)
+            return VANISHED
+        logging.error("Could not move %s to %s: %s", src_file_path, dest_dir_path, e)
+        return LEFT_BEHIND
+
+def map_files_to_directories(base_path, txt_files_path, sized_elements, domain_index, metrics=None, verify=False):
+    """Moves the file of every (element_tuple, size) to its destination and returns a MoveTally of the moves."""
     exception_dir_path = os.path.join(base_path, '_Exception')
-    if not os.path.exists(exception_dir_path):
-        os.makedirs(exception_dir_path)
+    created_dirs = CreatedDirs()
+    tally = MoveTally(exception_dir_path, keep_names=verify)
 
-    loop_count = 0  # Initialize loop counter
+    submitted = deque()  # (dest_dir_path, file_name, size) of the moves in flight, in submission order
 
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = []
-        for element_tuple in elements:
+    def jobs():
+        loop_count = 0  # Initialize loop counter
+        for element_tuple, size in sized_elements:
             loop_count += 1  # Increment loop counter
-            futures.append(executor.submit(process_file, element_tuple, base_path, txt_files_path, domain_elements, exception_dir_path, loop_count))
-        for future in futures:
-            future.result()  # To ensure any raised exceptions are caught
-
-def count_files_in_directory(directory):
-    count = 0
-    for root, _, files in os.walk(directory):
-        count += len(files)
-    return count
-
-def main():
+            # Each distinct destination is created once, here, before any worker moves into it
+            dest_dir_path = destination_dir(element_tuple, base_path, domain_index, exception_dir_path)
+            count(metrics, 'files_rejected' if dest_dir_path == exception_dir_path else 'files_routed')
+            created_dirs.ensure(dest_dir_path)
+            submitted.append((dest_dir_path, element_tuple[5], size))
+            yield element_tuple, txt_files_path, dest_dir_path, loop_count, size, metrics
+
+    # Submitted in a bounded window, so pending moves stay fixed, with a concurrency measured as it runs
+    with AdaptivePool() as pool:
+        for outcome in pool.map(process_file, jobs()):
+            tally.record(*submitted.popleft(), outcome)
+    logging.info("Created %d destination directories", len(created_dirs))
+    logging.info("Move workers: %d (peak %d, %d adjustments, mean move %.0f us)", pool.workers,
+                 pool.peak_workers, pool.adjustments, pool.stats()['mean_latency_us'])
+    if metrics is not None:
+        metrics.set('move_workers', pool.workers)
+        metrics.set('move_workers_peak', pool.peak_workers)
+    return tally
+
+def main(verify=False):
     txt_files_path = 'txtFiles'  # Path to the directory containing the .txt files
     base_output_path = 'destFolders'  # Base path where the directories are already created
     domain_file_path = 'input/domain_file.txt'  # Path to the domain file
@@ -111,42 +99,57 @@ def main():
     logging.basicConfig(filename=log_file_name, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
     start_time = time.time()  # Record the start time
-
-    # Fetch and extract data in parallel
-    with ProcessPoolExecutor() as executor:
-        txt_file_names_future = executor.submit(fetch_txt_files, txt_files_path)
-        domain_elements_future = executor.submit(read_domain_file, domain_file_path)
-        extracted_data_future = executor.submit(extract_elements, txt_file_names_future.result())
-
-    txt_file_names = txt_file_names_future.result()
-    logging.info("Text files found: %s", txt_file_names)
-
-    domain_elements = domain_elements_future.result()
-    extracted_data = extracted_data_future.result()
-
-    for data in extracted_data:
-        logging.info(data)
-
-    # Calculate space consumed before moving files
-    total_files = len(txt_file_names)
-    total_space_consumed = sum(os.path.getsize(os.path.join(txt_files_path, f)) for f in txt_file_names)
-    logging.info("Space consumed: %.2f MB", total_space_consumed / (1024 * 1024))
-    logging.info("Total files: %d", total_files)
-
-    map_files_to_directories(base_output_path, txt_files_path, extracted_data, domain_elements)
+    metrics = Metrics()
+
+    with span(metrics, 'domain_load'):
+        domain_index = load_domain_index(domain_file_path, DEST_FIELDS)
+    logging.info("Space complexity of read_domain_file: O(k) with k = %d", len(domain_index))
+
+    # Scan in chunks, with sizes from the scan, and move each chunk's files as the scan goes on
+    def sized_elements():
+        for chunk in metrics.iter_spans('scan', iter_txt_file_chunks(txt_files_path, with_stat=True)):
+            count(metrics, 'files_scanned', len(chunk))
+            with span(metrics, 'parse'):
+                elements = extract_elements([file_name for file_name, _ in chunk])
+            for element_tuple, (_, stat) in zip(elements, chunk):
+                logging.debug(element_tuple)
+                yield element_tuple, stat.st_size
+
+    tally = map_files_to_directories(base_output_path, txt_files_path, sized_elements(), domain_index, metrics,
+                                     verify)
+
+    # Space the scanned files consumed before they were moved
+    logging.info("Space consumed: %.2f MB", (tally.routed_bytes + tally.exception_bytes + tally.left_behind_bytes
+                                             + tally.vanished_bytes) / (1024 * 1024))
+    logging.info("Total files: %d", tally.routed + tally.exceptions + tally.left_behind + tally.vanished)
 
     end_time = time.time()  # Record the end time
     logging.info("Total time taken: %.2f seconds", end_time - start_time)
 
-    # Count number of files moved to designated folders and files moved to Exception folder
-    moved_files = count_files_in_directory(base_output_path)
-    exception_files = count_files_in_directory(os.path.join(base_output_path, '_Exception'))
-    remaining_files = count_files_in_directory(txt_files_path)
-    logging.info("Files moved to designated folders: %d", moved_files - exception_files)
-    logging.info("Files moved to Exception folder: %d", exception_files)
-    logging.info("Files which didn't move from txtFiles folder: %d", remaining_files)
+    # One structured summary per run, next to the log
+    summary = metrics.write_summary(log_file_name[:-len('.log')] + '_metrics.json')
+    for name, phase in summary['spans'].items():
+        logging.info("%s: %d in %.2f seconds (p50 %.0f us, p99 %.0f us)", name, phase['count'],
+                     phase['total_seconds'], phase['p50_us'], phase['p99_us'])
+    logging.info("Files per second: %.0f", summary['rates'].get('files_moved_per_second', 0.0))
+
+    # Counted as the moves finished: only this run's files, and no walk over destFolders or txtFiles
+    logging.info("Files moved to designated folders: %d (%.2f MB)", tally.routed, tally.routed_bytes / (1024 * 1024))
+    logging.info("Files moved to Exception folder: %d (%.2f MB)", tally.exceptions,
+                 tally.exception_bytes / (1024 * 1024))
+    logging.info("Files which didn't move from txtFiles folder: %d (%.2f MB)", tally.left_behind,
+                 tally.left_behind_bytes / (1024 * 1024))
+    logging.info("Files which vanished from txtFiles folder before their move: %d (%.2f MB)", tally.vanished,
+                 tally.vanished_bytes / (1024 * 1024))
+
+    if verify:
+        # Scans only the directories this run moved into
+        missing = tally.verify()
+        for path in missing:
+            logging.error("Moved file missing from its destination: %s", path)
+        logging.info("Verified %d moved files, %d missing", tally.routed + tally.exceptions, len(missing))
 
 if __name__ == '__main__':
     print('---------------Start---------------')
-    main()
+    main(verify='--verify' in sys.argv[1:])
     print('-------------Done-------------')
@@ -0,0 +1,48 @@
+"""Process-pool extraction for extract_workers; off by default, as it measured slower than in-process on one CPU."""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from domain_index import load_domain_index, METADATA_FIELDS
+from element_batch import ElementBatch
+from worker_pool import bounded_map
+
+_worker_state = {}  # Filled in each worker process by _init_worker
+
+
+def _init_worker(domain_file_path, fields):
+    _worker_state['index'] = load_domain_index(domain_file_path, fields)
+
+
+def _extract_chunk(file_names, fields):
+    batch = ElementBatch.from_names(file_names, fields)
+    return batch.keys, batch.key_codes, batch.valid, batch.accepted(_worker_state['index'])
+
+
+def extract_in_workers(name_chunks, domain_file_path, fields=METADATA_FIELDS, workers=None):
+    """Parses and validates name chunks in a process pool; yields (ElementBatch, accepted bitmap) in input order."""
+    workers = workers or os.cpu_count() or 1
+    submitted = deque()
+
+    def jobs():
+        for file_names in name_chunks:
+            submitted.append(file_names)
+            yield file_names, fields
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(domain_file_path, fields)) as executor:
+        for keys, key_codes, valid, accepted in bounded_map(executor, _extract_chunk, jobs(), workers * 2):
+            yield ElementBatch(keys, key_codes, valid, submitted.popleft()), accepted
+
+
+def iter_routes(results, route, rejected):
+    """Yields (element_tuple, route(key)) per row of extract_in_workers results, rejected for rows not accepted."""
+    for batch, accepted in results:
+        # Routed once per distinct key; the workers already checked the keys against the domain index
+        destinations = batch.map_keys(route)
+        key_codes = batch.key_codes
+        for row, element_tuple in enumerate(batch):
+            if accepted[row >> 3] & (1 << (row & 7)):
+                yield element_tuple, destinations[key_codes[row]]
+            else:
+                yield element_tuple, rejected
@@ -0,0 +1,100 @@
+"""Batched writer for resource/processed_files_log.txt: move workers queue names, one thread appends and fsyncs them."""
+import os
+import queue
+import threading
+import time
+
+from metrics import span, count
+
+DEFAULT_LOG_PATH = os.path.join('resource', 'processed_files_log.txt')
+
+_STOP = object()
+
+
+class ProcessedLogWriter:
+    """Single writer thread for the processed files log, fed through a queue."""
+
+    def __init__(self, log_file_path=DEFAULT_LOG_PATH, batch_size=1000, flush_interval=1.0, on_flush=None,
+                 metrics=None):
+        self.log_file_path = log_file_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.metrics = metrics
+        self.lines_written = 0
+        self.batches_written = 0
+        self._queue = queue.Queue()
+        self._error = None
+
+        log_dir = os.path.dirname(log_file_path)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='processed-log-writer', daemon=True)
+        self._thread.start()
+
+    def write(self, file_name):
+        """Queues one processed file name; never touches the log file itself."""
+        self._queue.put(file_name)
+
+    def close(self):
+        """Writes everything still queued and stops the writer thread; raises the first error it hit."""
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self):
+        try:
+            with open(self.log_file_path, 'a', encoding='utf-8', errors='surrogateescape') as log_file:
+                self._write_batches(log_file)
+        except Exception as e:  # Kept for close(), whatever it is, instead of dying with the thread
+            print(f"Error in processed files log {self.log_file_path}: {e}")
+            self._fail(e)
+
+    def _fail(self, error):
+        if self._error is None:
+            self._error = error
+
+    def _write_batches(self, log_file):
+        batch = []
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(log_file, batch)
+                batch = []
+                deadline = None
+
+    def _flush(self, log_file, batch):
+        try:
+            with span(self.metrics, 'log'):
+                log_file.write(''.join("%s\n" % file_name for file_name in batch))
+                log_file.flush()
+                os.fsync(log_file.fileno())
+            count(self.metrics, 'lines_logged', len(batch))
+            self.lines_written += len(batch)
+            self.batches_written += 1
+            if self.on_flush is not None:
+                self.on_flush(batch)
+        except Exception as e:
+            # Keep draining so workers never block; the error surfaces from close()
+            print(f"Error writing processed files log {self.log_file_path}: {e}")
+            self._fail(e)
@@ -0,0 +1,94 @@
+"""Write-ahead journal of each group's completed steps, which makes a fileMapping window resumable."""
+import threading
+import time
+
+from jsonl_journal import read_records, JournalFile
+
+JOURNAL_NAME = 'journal.jsonl'
+
+STEPS = ('planned', 'merged', 'tarred', 'moved', 'logged')
+
+
+class RunJournal:
+    """Per-group step records for one window, loaded from and appended to one file."""
+
+    def __init__(self, journal_path, commit_every=1000, commit_interval=1.0):
+        self.journal_path = journal_path
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self._steps = {}
+        self._plan = {}
+        self._pending = []
+        self._pending_since = None
+        self._lock = threading.Lock()
+        for record in read_records(journal_path):
+            self._apply(record)
+            if record['step'] == 'planned':
+                self._plan[record['id']] = (tuple(record['key']), record['files'])
+        self._file = JournalFile(journal_path)
+
+    def _apply(self, record):
+        if record['step'] == 'planned':
+            # A new plan starts the group over, except that its name is never logged twice
+            self._steps[record['id']] = {'planned'} | (self._steps.get(record['id'], set()) & {'logged'})
+        else:
+            self._steps.setdefault(record['id'], set()).add(record['step'])
+
+    def plan(self, groups):
+        """Records the plan for groups ({group_id: (key, files)}), adding late files to planned groups; returns it."""
+        new_groups = {}
+        for group_id, (key, files) in groups.items():
+            planned = self._plan.get(group_id)
+            if planned is None:
+                new_groups[group_id] = (key, files)
+                continue
+            recorded = set(planned[1])
+            late_files = [file_name for file_name in files if file_name not in recorded]
+            if late_files:
+                new_groups[group_id] = (planned[0], planned[1] + late_files)
+        self._append([{'id': group_id, 'step': 'planned', 'key': list(key), 'files': files}
+                      for group_id, (key, files) in new_groups.items()], commit=True)
+        self._plan.update(new_groups)
+        return dict(self._plan)
+
+    def done(self, group_id, step):
+        return step in self._steps.get(group_id, ())
+
+    def record(self, group_id, *steps):
+        self._append([{'id': group_id, 'step': step} for step in steps])
+
+    def record_many(self, group_ids, step, commit=False):
+        self._append([{'id': group_id, 'step': step} for group_id in group_ids], commit)
+
+    def commit(self):
+        """Writes and fsyncs every pending record."""
+        with self._lock:
+            self._write_pending()
+
+    def _append(self, records, commit=False):
+        with self._lock:
+            for record in records:
+                self._apply(record)
+            self._pending.extend(records)
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            if commit or len(self._pending) >= self.commit_every or \
+                    time.monotonic() - self._pending_since >= self.commit_interval:
+                self._write_pending()
+
+    def _write_pending(self):
+        self._file.append(self._pending)
+        self._pending = []
+        self._pending_since = None
+
+    def close(self):
+        try:
+            self.commit()
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
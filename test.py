@@ -1,13 +1,11 @@
 import os
 import shutil
 
+from dir_scanner import iter_txt_files
+
 
 def fetch_txt_files(directory_path):
-    txt_files = []
-    for file_name in os.listdir(directory_path):
-        if file_name.endswith('.txt'):
-            txt_files.append(file_name)
-    return txt_files
+    return list(iter_txt_files(directory_path))
 
 
 def extract_elements(file_names):
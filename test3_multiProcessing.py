@@ -4,13 +4,15 @@ from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import time
 import logging
 
+from dir_scanner import iter_txt_files
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
 def fetch_txt_files(directory_path):
     try:
-        return [file_name for file_name in os.listdir(directory_path) if file_name.endswith('.txt')]
+        return list(iter_txt_files(directory_path))
     except Exception as e:
         logging.error("Error fetching txt files: ",e)
         return []
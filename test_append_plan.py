@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+import final_test_mp_fmapp_merg
+import multiProc_fileMapping_merge
+from append_plan import group_by_destination, merge_into_destination
+from merge_engine import MERGE_SEPARATOR
+
+
+def test_group_appends_into_smallest_name_and_deletes_sources(tmp_path):
+    src_dir = tmp_path / 'txtFiles'
+    dest_dir = tmp_path / 'dest'
+    src_dir.mkdir()
+    dest_dir.mkdir()
+    (dest_dir / 'b.txt').write_bytes(b'existing')
+    for name in ('c.txt', 'a.txt'):
+        (src_dir / name).write_bytes(name.encode())
+
+    groups = group_by_destination([(str(src_dir / 'c.txt'), str(dest_dir)),
+                                   (str(src_dir / 'a.txt'), str(dest_dir))])
+    target_path, appended = merge_into_destination(str(dest_dir), groups[str(dest_dir)])
+
+    assert target_path == str(dest_dir / 'a.txt')
+    assert appended == 2
+    assert os.listdir(str(dest_dir)) == ['a.txt']
+    assert os.listdir(str(src_dir)) == []
+    assert (dest_dir / 'a.txt').read_bytes() == MERGE_SEPARATOR.join([b'a.txt', b'existing', b'c.txt'])
+
+
+def test_missing_sources_are_skipped(tmp_path):
+    dest_dir = tmp_path / 'dest'
+    dest_dir.mkdir()
+    (tmp_path / 'b.txt').write_bytes(b'b')
+
+    target_path, appended = merge_into_destination(str(dest_dir), [str(tmp_path / 'a.txt'), str(tmp_path / 'b.txt')])
+
+    assert target_path == str(dest_dir / 'b.txt')
+    assert appended == 0
+    assert (dest_dir / 'b.txt').read_bytes() == b'b'
+
+
+@pytest.mark.parametrize('variant', [final_test_mp_fmapp_merg, multiProc_fileMapping_merge])
+def test_grouped_and_per_file_modes_both_create_missing_destinations(tmp_path, variant):
+    names = ['8x8439_gb_2_dh2_0_0_in-for-resellers_%d.txt' % i for i in range(4)] + ['bad.txt']
+    domain_index = {('8x8439', 'GB', 'in-for-resellers', 'DH2')}
+
+    def run(grouped):
+        run_path = tmp_path / ('grouped' if grouped else 'per_file')
+        src_dir = run_path / 'txtFiles'
+        src_dir.mkdir(parents=True)
+        for name in names:
+            (src_dir / name).write_text(name)
+        elements = variant.extract_elements(names)
+        variant.map_files_to_directories(str(run_path / 'destFolders'), str(src_dir), elements, domain_index,
+                                         grouped=grouped)
+        tree = {}
+        for root, _, files in os.walk(str(run_path / 'destFolders')):
+            for name in files:
+                content = open(os.path.join(root, name)).read()
+                tree[os.path.relpath(os.path.join(root, name), str(run_path))] = sorted(
+                    part.strip() for part in content.split('---------------------------'))
+        return tree, os.listdir(str(src_dir))
+
+    grouped_tree, grouped_left = run(True)
+    assert grouped_left == []
+    assert run(False) == (grouped_tree, grouped_left)
+    assert sorted(grouped_tree) == [os.path.join('destFolders', '8x8439', 'GB', 'in-for-resellers', 'DH2', 'CDR',
+                                                 names[0]),
+                                    os.path.join('destFolders', '_Exception', 'bad.txt')]
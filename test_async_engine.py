@@ -0,0 +1,70 @@
+import os
+import random
+import threading
+import time
+
+import pytest
+
+import fileMapping
+from async_engine import AsyncFileEngine
+
+
+def test_jobs_run_in_order_per_key_and_concurrently_across_keys():
+    order = {}
+    running = []
+    peak = [0]
+    lock = threading.Lock()
+
+    def job(key, seq):
+        with lock:
+            running.append(key)
+            peak[0] = max(peak[0], len(running))
+        time.sleep(random.random() / 1000)
+        with lock:
+            running.remove(key)
+            order.setdefault(key, []).append(seq)
+
+    jobs = [('dir%d' % (i % 20), job, ('dir%d' % (i % 20), i)) for i in range(1000)]
+    engine = AsyncFileEngine(offload_workers=16, max_in_flight=64)
+    assert engine.run(jobs) == 1000
+
+    for _, seqs in order.items():
+        assert seqs == sorted(seqs)
+    assert peak[0] > 1
+    assert engine.peak_in_flight <= 64
+
+
+def test_first_error_stops_submission_and_is_raised():
+    submitted = []
+
+    def jobs():
+        for i in range(10000):
+            submitted.append(i)
+            yield 'd%d' % (i % 4), fail_on_ten, (i,)
+
+    def fail_on_ten(i):
+        if i == 10:
+            raise OSError("server went away")
+
+    with pytest.raises(OSError):
+        AsyncFileEngine(offload_workers=4, max_in_flight=8).run(jobs())
+    assert len(submitted) < 10000
+
+
+def test_async_main_routes_like_the_thread_engine(tmp_path, monkeypatch):
+    def run(engine):
+        run_path = tmp_path / engine
+        os.makedirs(str(run_path / 'source'))
+        os.makedirs(str(run_path / 'resource'))
+        with open(str(run_path / 'resource' / 'domain_file.txt'), 'w') as f:
+            f.write('8x8439/gb/2/dh2/0/0/in-for-resellers/12/\n42com9/de/1/ap/0/0/numbers/12/\n')
+        for i in range(60):
+            name = ['8x8439_gb_2_dh2_0_0_x_%d.txt', '42com9_de_1_ap_0_0_y_%d.txt', 'zz_fr_9_q_0_0_z_%d.txt'][i % 3]
+            with open(str(run_path / 'source' / (name % i)), 'w') as f:
+                f.write('row %d\n' % i)
+        monkeypatch.chdir(str(run_path))
+        fileMapping.main(engine=engine, offload_workers=8)
+        tree = sorted((os.path.relpath(root, 'cdrs'), sorted(files)) for root, _, files in os.walk('cdrs'))
+        return tree, sorted(open('resource/processed_files_log.txt').read().splitlines())
+
+    assert run('async') == run('threads')
@@ -0,0 +1,92 @@
+import os
+
+from dedup import DuplicateFilter, SeenIndex, file_digest
+
+
+def test_index_persists_with_lru_and_ttl_eviction(tmp_path):
+    index_path = str(tmp_path / 'seen_hashes.txt')
+    now = [1000]
+    index = SeenIndex(index_path, max_entries=2, ttl_seconds=100, clock=lambda: now[0])
+    index.add(b'a' * 16, 'a.txt')
+    now[0] = 1010
+    index.add(b'b' * 16, 'b.txt')
+    index.commit()
+    now[0] = 1020
+    assert index.lookup(b'a' * 16) == 'a.txt'  # a is now the most recently seen
+    index.add(b'c' * 16, 'c.txt')
+    index.commit()
+    with open(index_path, 'a') as index_file:
+        index_file.write('deadbeef\t10')  # Torn write from a crash
+
+    now[0] = 1030
+    reloaded = SeenIndex(index_path, max_entries=2, ttl_seconds=100, clock=lambda: now[0])
+    assert len(reloaded) == 2
+    assert reloaded.lookup(b'b' * 16) is None  # Least recently seen, evicted
+    assert reloaded.lookup(b'a' * 16) == 'a.txt'
+    now[0] = 1200
+    assert reloaded.lookup(b'c' * 16) is None  # Expired
+
+
+def test_filter_skips_resent_content_and_quarantines_it(tmp_path):
+    src_dir = tmp_path / 'source'
+    src_dir.mkdir()
+    contents = {'x_gb_2_dh2_0_0_a_1.txt': b'row 1\n', 'x_gb_2_dh2_0_0_a_2.txt': b'row 2\n',
+                'x_gb_2_dh2_0_0_a_3.txt': b'row 1\n', 'x_gb_2_dh2_0_0_a_4.txt': b''}
+    for name, content in contents.items():
+        (src_dir / name).write_bytes(content)
+    elements = [('x', 'GB', '2', 'DH2', 'CDR', name) for name in sorted(contents)]
+    elements.append(('EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'CDR', 'bad.txt'))
+
+    index = SeenIndex(str(tmp_path / 'seen_hashes.txt'))
+    quarantine_dir = str(tmp_path / 'duplicates')
+    dup_filter = DuplicateFilter(index, str(src_dir), quarantine_dir)
+    kept = [element[5] for element in dup_filter.filter(elements)]
+    assert kept == ['x_gb_2_dh2_0_0_a_1.txt', 'x_gb_2_dh2_0_0_a_2.txt', 'x_gb_2_dh2_0_0_a_4.txt', 'bad.txt']
+    assert os.listdir(quarantine_dir) == ['x_gb_2_dh2_0_0_a_3.txt']
+    assert file_digest(str(src_dir / 'x_gb_2_dh2_0_0_a_1.txt')) != file_digest(str(src_dir / 'x_gb_2_dh2_0_0_a_4.txt'))
+
+    # Nothing is persisted before commit, so a crash before the merge loses no content
+    assert len(SeenIndex(str(tmp_path / 'seen_hashes.txt'))) == 0
+    index.commit()
+    (src_dir / 'resent_gb_2_dh2_0_0_a_5.txt').write_bytes(b'row 2\n')
+    dup_filter = DuplicateFilter(SeenIndex(str(tmp_path / 'seen_hashes.txt')), str(src_dir))
+    assert list(dup_filter.filter([('resent', 'GB', '2', 'DH2', 'CDR', 'resent_gb_2_dh2_0_0_a_5.txt')])) == []
+    assert dup_filter.duplicates == 1
+
+
+def test_empty_files_are_never_duplicates(tmp_path):
+    src_dir = tmp_path / 'source'
+    src_dir.mkdir()
+    (src_dir / 'x_gb_2_dh2_0_0_a_1.txt').write_bytes(b'')
+    (src_dir / 'y_be_5_ew0_0_0_a_1.txt').write_bytes(b'')
+    elements = [('x', 'GB', '2', 'DH2', 'CDR', 'x_gb_2_dh2_0_0_a_1.txt'),
+                ('y', 'BE', '5', 'EW0', 'CDR', 'y_be_5_ew0_0_0_a_1.txt')]
+
+    index = SeenIndex(str(tmp_path / 'seen_hashes.txt'))
+    dup_filter = DuplicateFilter(index, str(src_dir), str(tmp_path / 'duplicates'), sources_kept=False)
+    assert list(dup_filter.filter(elements)) == elements
+    assert dup_filter.duplicates == 0
+    index.commit()
+    assert len(index) == 0
+
+
+def test_rerun_over_kept_sources_is_not_a_duplicate(tmp_path):
+    src_dir = tmp_path / 'source'
+    src_dir.mkdir()
+    (src_dir / 'x_gb_2_dh2_0_0_a_1.txt').write_bytes(b'row 1\n')
+    elements = [('x', 'GB', '2', 'DH2', 'CDR', 'x_gb_2_dh2_0_0_a_1.txt')]
+    index_path = str(tmp_path / 'seen_hashes.txt')
+    dup_filter = DuplicateFilter(SeenIndex(index_path), str(src_dir))
+    assert len(list(dup_filter.filter(elements))) == 1
+    dup_filter.index.commit()
+
+    quarantine_dir = str(tmp_path / 'duplicates')
+    dup_filter = DuplicateFilter(SeenIndex(index_path), str(src_dir), quarantine_dir)
+    assert list(dup_filter.filter(elements)) == []
+    assert (dup_filter.duplicates, dup_filter.already_processed) == (0, 1)
+    assert not os.path.exists(quarantine_dir)
+
+    # Where processed files are moved away, the same name coming back is a resend
+    dup_filter = DuplicateFilter(SeenIndex(index_path), str(src_dir), sources_kept=False)
+    assert list(dup_filter.filter(elements)) == []
+    assert (dup_filter.duplicates, dup_filter.already_processed) == (1, 0)
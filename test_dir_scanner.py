@@ -0,0 +1,41 @@
+import os
+
+from dir_scanner import iter_txt_files, iter_txt_file_chunks
+
+
+def make_files(tmp_path, count):
+    for i in range(count):
+        (tmp_path / ('cdr_%02d.txt' % i)).write_bytes(b'x' * i)
+    (tmp_path / 'notes.csv').write_text('skipped')
+    (tmp_path / 'partial.txt.tmp').write_text('skipped')
+
+
+def test_chunks_split_at_chunk_size(tmp_path):
+    assert list(iter_txt_file_chunks(str(tmp_path), chunk_size=4)) == []
+
+    make_files(tmp_path, 8)
+    chunks = list(iter_txt_file_chunks(str(tmp_path), chunk_size=4))
+    assert [len(chunk) for chunk in chunks] == [4, 4]  # An exact multiple leaves no empty chunk
+
+    names = sorted(name for chunk in chunks for name in chunk)
+    assert names == ['cdr_%02d.txt' % i for i in range(8)]
+    assert sorted(iter_txt_files(str(tmp_path))) == names
+
+    chunks = list(iter_txt_file_chunks(str(tmp_path), chunk_size=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 2]
+
+
+def test_with_stat_gives_the_dir_entry_sizes(tmp_path, monkeypatch):
+    make_files(tmp_path, 5)
+
+    def no_path_stat(*args, **kwargs):
+        raise AssertionError("stat by path")
+
+    monkeypatch.setattr(os, 'stat', no_path_stat)
+    chunks = list(iter_txt_file_chunks(str(tmp_path), chunk_size=2, with_stat=True))
+    monkeypatch.undo()
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    sizes = dict(item for chunk in chunks for item in chunk)
+    assert sizes.keys() == {'cdr_%02d.txt' % i for i in range(5)}
+    assert {name: stat.st_size for name, stat in sizes.items()} == {'cdr_%02d.txt' % i: i for i in range(5)}
@@ -0,0 +1,46 @@
+import pytest
+
+from domain_index import read_domain_index, load_domain_index, make_key, METADATA_FIELDS, DEST_FIELDS
+
+
+@pytest.fixture
+def domain_file(tmp_path):
+    file_path = tmp_path / 'domain_file.txt'
+    file_path.write_text(
+        "10tel411/be/5/d06/1/0/geographic-number-hosting/15/   \n"
+        "8x8439/at/2/dhy/0/0/in-for-resellers/12/\n"
+        "short/line\n")
+    return str(file_path)
+
+
+def test_metadata_keys_are_whole_lines(domain_file):
+    domain_index = read_domain_index(domain_file, METADATA_FIELDS)
+
+    assert domain_index == {('10tel411', 'BE', '5', 'D06'), ('8x8439', 'AT', '2', 'DHY')}
+    # Every field exists somewhere in the file, but never on one line together
+    assert ('10tel411', 'AT', '5', 'D06') not in domain_index
+
+
+def test_dest_keys_use_seventh_field(domain_file):
+    domain_index = read_domain_index(domain_file, DEST_FIELDS)
+
+    key = make_key('8x8439_at_2_dhy_0_0_in-for-resellers_240723.txt'.split('_'), DEST_FIELDS)
+    assert key == ('8x8439', 'AT', 'in-for-resellers', 'DHY')
+    assert key in domain_index
+
+
+def test_cache_reused_until_domain_file_changes(domain_file, monkeypatch):
+    first = load_domain_index(domain_file, METADATA_FIELDS)
+    assert first == read_domain_index(domain_file, METADATA_FIELDS)
+
+    # Unchanged file: the sidecar is loaded and the text is not parsed again
+    def fail_parse(*args):
+        raise AssertionError("domain file parsed again")
+    monkeypatch.setattr('domain_index.parse_domain_lines', fail_parse)
+    assert load_domain_index(domain_file, METADATA_FIELDS) == first
+    monkeypatch.undo()
+
+    with open(domain_file, 'a') as f:
+        f.write("42com9/de/1/ap/0/0/reseller-connect/15/\n")
+    changed = load_domain_index(domain_file, METADATA_FIELDS)
+    assert ('42com9', 'DE', '1', 'AP') in changed
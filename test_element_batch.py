@@ -0,0 +1,34 @@
+import pickle
+
+from domain_index import DEST_FIELDS
+from element_batch import ElementBatch
+from filename_parser import parse_elements
+
+NAMES = ['8x8439_gb_5_dh2_0_0_in-for-resellers_1.txt', 'short_name.txt',
+         '8x8439_gb_5_dh2_0_0_in-for-resellers_2.txt', '42com9_de_2_dh2_0_0_numbers_3.txt',
+         'caf\udce9_gb_5_dh2_0_0_numbers_4.txt']
+
+
+def test_rows_match_parse_elements_and_survive_packing():
+    batch = ElementBatch.from_names(NAMES, DEST_FIELDS)
+
+    assert list(batch) == parse_elements(NAMES, DEST_FIELDS)
+    assert len(batch.keys) == 3
+    assert [batch.is_valid(row) for row in range(len(batch))] == [True, False, True, True, True]
+    assert list(pickle.loads(pickle.dumps(batch))) == list(batch)
+
+    block = batch.to_shared_memory()
+    try:
+        assert list(ElementBatch.from_shared_memory(block.name)) == list(batch)
+    finally:
+        block.close()
+        block.unlink()
+
+
+def test_accepted_checks_each_distinct_key_once():
+    batch = ElementBatch.from_names(NAMES, DEST_FIELDS)
+    domain_index = frozenset([('8x8439', 'GB', 'in-for-resellers', 'DH2')])
+
+    accepted = batch.accepted(domain_index)
+
+    assert [bool(accepted[0] & (1 << row)) for row in range(len(batch))] == [True, False, True, False, False]
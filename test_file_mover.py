@@ -0,0 +1,110 @@
+import os
+import threading
+from collections import Counter
+
+import fileMapping
+import multiproc_logging_script
+from file_mover import CreatedDirs, MoveTally, MOVED, LEFT_BEHIND, VANISHED
+
+
+def test_tally_counts_moves_and_verifies_touched_dirs(tmp_path):
+    routed_dir = str(tmp_path / 'dest' / 'a')
+    exception_dir = str(tmp_path / 'dest' / '_Exception')
+    for dir_path in (routed_dir, exception_dir):
+        os.makedirs(dir_path)
+    for name in ('one.txt', 'two.txt'):
+        open(os.path.join(routed_dir, name), 'w').close()
+
+    tally = MoveTally(exception_dir, keep_names=True)
+    tally.record(routed_dir, 'one.txt', 10, MOVED)
+    tally.record(routed_dir, 'two.txt', 20, MOVED)
+    tally.record(exception_dir, 'bad.txt', 5, MOVED)
+    tally.record(routed_dir, 'stuck.txt', 7, LEFT_BEHIND)
+    tally.record(routed_dir, 'gone.txt', 3, VANISHED)
+
+    assert (tally.routed, tally.routed_bytes) == (2, 30)
+    assert (tally.exceptions, tally.exception_bytes) == (1, 5)
+    assert (tally.left_behind, tally.left_behind_bytes) == (1, 7)
+    assert (tally.vanished, tally.vanished_bytes) == (1, 3)
+    assert tally.verify() == [os.path.join(exception_dir, 'bad.txt')]
+
+
+def test_failed_moves_are_tallied_by_whether_the_source_is_left(tmp_path, monkeypatch):
+    src_dir = tmp_path / 'txtFiles'
+    src_dir.mkdir()
+    for name in ('ok.txt', 'denied.txt'):
+        (src_dir / name).write_text('x')
+    elements = [(name[:-4], 'GB', '2', 'DH2', 'CDR', name) for name in ('ok.txt', 'denied.txt', 'gone.txt')]
+    domain_index = {element_tuple[:4] for element_tuple in elements}
+    real_move = multiproc_logging_script.shutil.move
+
+    def move(src, dst):
+        if src.endswith('denied.txt'):
+            raise PermissionError(13, "Permission denied", src)
+        return real_move(src, dst)
+
+    monkeypatch.setattr(multiproc_logging_script.shutil, 'move', move)
+    tally = multiproc_logging_script.map_files_to_directories(str(tmp_path / 'dest'), str(src_dir),
+                                                              zip(elements, [1, 2, 4]), domain_index)
+
+    assert (tally.routed, tally.routed_bytes) == (1, 1)
+    assert (tally.left_behind, tally.left_behind_bytes) == (1, 2)
+    assert (tally.vanished, tally.vanished_bytes) == (1, 4)
+    assert os.listdir(str(src_dir)) == ['denied.txt']
+
+
+def test_created_dirs_makes_each_directory_once(tmp_path, monkeypatch):
+    made = Counter()
+    real_makedirs = os.makedirs
+
+    def makedirs(dir_path, *args, **kwargs):
+        made[dir_path] += 1
+        real_makedirs(dir_path, *args, **kwargs)
+
+    monkeypatch.setattr(os, 'makedirs', makedirs)
+    dirs = [str(tmp_path / name) for name in ('a', 'b', 'a', 'a/c', 'b')]
+    created_dirs = CreatedDirs()
+    created_dirs.ensure_all(dirs)
+    for dir_path in dirs:
+        created_dirs.ensure(dir_path)
+
+    assert made == Counter(set(dirs))
+    assert len(created_dirs) == 3
+    assert all(os.path.isdir(dir_path) for dir_path in dirs)
+
+
+def test_planning_pass_leaves_workers_no_destination_stat(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('lab')
+    domain_index = {('dom%d' % (i % 3), 'GB', '2', 'D%d' % i) for i in range(30)}
+    merged_files = []
+    for key in sorted(domain_index) + [('zz', 'FR', '9', 'Q')]:
+        merged_file_path = os.path.join('lab', fileMapping.merged_file_name_for(key, '260101071500'))
+        open(merged_file_path, 'w').close()
+        merged_files.append(merged_file_path)
+
+    made = Counter()
+    worker_stats = []
+    real_makedirs, real_stat = os.makedirs, os.stat
+
+    def makedirs(dir_path, *args, **kwargs):
+        made[dir_path] += 1
+        real_makedirs(dir_path, *args, **kwargs)
+
+    def stat(path, *args, **kwargs):
+        if threading.current_thread() is not threading.main_thread() and 'cdrs' in str(path):
+            worker_stats.append(path)
+        return real_stat(path, *args, **kwargs)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(os, 'makedirs', makedirs)
+        patch.setattr(os, 'stat', stat)
+        fileMapping.map_files_to_directories('cdrs', merged_files, domain_index, '260101071500', 'A',
+                                             log_file_path='processed_files_log.txt')
+
+    base = os.path.join('cdrs', '260101071500', 'A')
+    expected_dirs = [os.path.join(base, name) for name in ('_Errors', 'dom0', 'dom1', 'dom2')]
+    assert sorted(dir_path for dir_path in made if dir_path.startswith(base + os.sep)) == expected_dirs
+    assert all(made[dir_path] == 1 for dir_path in expected_dirs)
+    assert worker_stats == []
+    assert sum(len(names) for _, _, names in os.walk('cdrs')) == 31
@@ -0,0 +1,22 @@
+from domain_index import METADATA_FIELDS, DEST_FIELDS
+from filename_parser import Element, parse_element, parse_elements, parse_log_name, parse_log_names
+
+
+def test_elements_follow_the_field_layout():
+    names = ['8x8439_gb_5_dh2_0_0_in-for-resellers_17_extra_fields.txt', 'short_name.txt']
+
+    assert parse_elements(names, METADATA_FIELDS) == [
+        ('8x8439', 'GB', '5', 'DH2', 'CDR', names[0]),
+        ('EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'EXCEPTION', 'CDR', names[1]),
+    ]
+    assert parse_elements(names, DEST_FIELDS)[0] == ('8x8439', 'GB', 'in-for-resellers', 'DH2', 'CDR', names[0])
+    assert parse_element(names[0], DEST_FIELDS) == Element(*parse_elements(names, DEST_FIELDS)[0])
+
+
+def test_log_names():
+    names = ['3star170_BE_5_EW0_240723151500.txt', 'a__240723151500.txt', 'a_240723151500.txt',
+             'a_b_24072315150.txt', 'a_b_240723151500.tar']
+
+    assert parse_log_names(names) == [('3star170', 'BE_5_EW0', '240723151500'), ('a', '', '240723151500'),
+                                      None, None, None]
+    assert parse_log_name(names[0]).group == 'BE_5_EW0'
@@ -0,0 +1,122 @@
+import json
+import os
+import tarfile
+import threading
+import time
+
+import fileMapping
+from live_window import LiveWindow
+from merge_engine import MERGE_SEPARATOR
+from metrics import Metrics
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_restart_redoes_an_interrupted_append_and_skips_merged_files(tmp_path):
+    src_dir = tmp_path / 'source'
+    src_dir.mkdir()
+    (src_dir / 'f1.txt').write_bytes(b'one\n')
+    (src_dir / 'f2.txt').write_bytes(b'two\n')
+    merged_path = str(tmp_path / 'cdrs' / 'a' / 'a_B_c_D_1.txt')
+    journal_path = str(tmp_path / 'live.jsonl')
+    log_path = str(tmp_path / 'processed_files_log.txt')
+
+    def open_window():
+        return LiveWindow(journal_path, lambda key: (merged_path, True), str(src_dir), log_path)
+
+    with open_window() as live_window:
+        live_window.add([('a', 'B', 'c', 'D', 'CDR', 'f1.txt'), ('EXCEPTION',) * 4 + ('CDR', 'bad.txt')])
+    assert open(merged_path, 'rb').read() == b'one\n' + MERGE_SEPARATOR
+
+    # A crash halfway through appending f2
+    with open(journal_path, 'a') as journal_file:
+        journal_file.write(json.dumps({'id': 'a_B_c_D_1.txt', 'step': 'appending', 'key': ['a', 'B', 'c', 'D'],
+                                       'dest': merged_path, 'log': True, 'size': os.path.getsize(merged_path),
+                                       'files': ['f2.txt']}) + '\n')
+    with open(merged_path, 'ab') as merged_file:
+        merged_file.write(b'tw')
+
+    with open_window() as live_window:
+        live_window.add([('a', 'B', 'c', 'D', 'CDR', 'f2.txt'), ('a', 'B', 'c', 'D', 'CDR', 'f1.txt')])
+        assert live_window.groups() == [(('a', 'B', 'c', 'D'), merged_path)]
+    assert open(merged_path, 'rb').read() == b'one\n' + MERGE_SEPARATOR + b'two\n' + MERGE_SEPARATOR
+    assert open(log_path).read().split() == ['a_B_c_D_1.txt']
+
+
+def test_tar_is_written_on_the_first_batch_and_on_close(tmp_path):
+    src_dir = tmp_path / 'source'
+    src_dir.mkdir()
+    (src_dir / 'f1.txt').write_bytes(b'one\n')
+    (src_dir / 'f2.txt').write_bytes(b'two\n')
+    merged_path = str(tmp_path / 'cdrs' / 'a' / 'a_B_c_D_1.txt')
+    tar_path = str(tmp_path / 'a_B_c_D.tar')
+
+    with LiveWindow(str(tmp_path / 'live.jsonl'), lambda key: (merged_path, True), str(src_dir),
+                    str(tmp_path / 'processed_files_log.txt'), tar_name=lambda key: 'a_B_c_D.tar') as live_window:
+        live_window.add([('a', 'B', 'c', 'D', 'CDR', 'f1.txt')])
+        with tarfile.open(tar_path) as tar:
+            assert tar.extractfile('a_B_c_D_1.txt').read() == b'one\n' + MERGE_SEPARATOR
+        live_window.add([('a', 'B', 'c', 'D', 'CDR', 'f2.txt')])
+
+        assert open(merged_path, 'rb').read() == b'one\n' + MERGE_SEPARATOR + b'two\n' + MERGE_SEPARATOR
+        with tarfile.open(tar_path) as tar:
+            assert tar.extractfile('a_B_c_D_1.txt').read() == b'one\n' + MERGE_SEPARATOR
+    with tarfile.open(tar_path) as tar:
+        assert tar.extractfile('a_B_c_D_1.txt').read() == open(merged_path, 'rb').read()
+    assert sorted(os.listdir(os.path.dirname(merged_path))) == ['a_B_c_D_1.txt']
+    assert sorted(os.listdir(str(tmp_path))) == ['a_B_c_D.tar', 'cdrs', 'live.jsonl', 'processed_files_log.txt',
+                                                 'source']
+
+
+def test_cost_of_an_add_stays_flat_as_the_group_grows(tmp_path):
+    src_dir = tmp_path / 'source'
+    src_dir.mkdir()
+    for number in range(200):
+        (src_dir / ('f%d.txt' % number)).write_bytes(b'x' * 1000)
+    metrics = Metrics()
+    written = []
+
+    with LiveWindow(str(tmp_path / 'live.jsonl'), lambda key: (str(tmp_path / 'cdrs' / 'a_B_c_D_1.txt'), True),
+                    str(src_dir), str(tmp_path / 'processed_files_log.txt'), metrics=metrics,
+                    tar_name=lambda key: 'a_B_c_D.tar') as live_window:
+        for number in range(200):
+            before = metrics.counters()
+            live_window.add([('a', 'B', 'c', 'D', 'CDR', 'f%d.txt' % number)])
+            after = metrics.counters()
+            written.append(sum(after.get(name, 0) - before.get(name, 0) for name in ('bytes_merged', 'bytes_tarred')))
+
+    # Only the first batch is tarred mid-window; every later one writes just its own file
+    assert set(written[1:]) == {1000 + len(MERGE_SEPARATOR)}
+
+
+def test_watch_routes_each_file_as_it_lands(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('source')
+    os.makedirs('resource')
+    with open('resource/domain_file.txt', 'w') as f:
+        f.write('8x8439/gb/2/dh2/0/0/in-for-resellers/12/\n')
+    stop = threading.Event()
+    thread = threading.Thread(target=fileMapping.watch, kwargs={'interval': 0.02, 'stop': stop, 'use_inotify': False})
+    thread.start()
+    try:
+        date_time_str, time_period = fileMapping.current_window()
+        name = '8x8439_GB_2_DH2_%s.txt' % date_time_str
+        merged_path = os.path.join('cdrs', date_time_str, time_period, '8x8439', name)
+        with open('source/8x8439_gb_2_dh2_0_0_x_1.txt', 'w') as f:
+            f.write('one\n')
+        wait_for(lambda: os.path.exists(merged_path) and b'one' in open(merged_path, 'rb').read())
+        with open('source/8x8439_gb_2_dh2_0_0_x_2.txt', 'w') as f:
+            f.write('two\n')
+        wait_for(lambda: b'two' in open(merged_path, 'rb').read())
+    finally:
+        stop.set()
+        thread.join()
+
+    with tarfile.open(os.path.join('lab', 'metadata', date_time_str, '8x8439_GB_2_DH2.tar')) as tar:
+        assert tar.extractfile(name).read() == open(merged_path, 'rb').read()
+    assert open('resource/processed_files_log.txt').read().split() == [name]
@@ -0,0 +1,100 @@
+import os
+import tarfile
+
+import pytest
+
+import fileMapping
+import merge_engine
+from merge_engine import merge_files, stream_merge_into_tar, open_tar_for_write, tar_extension, MERGE_SEPARATOR
+
+
+def write_sources(tmp_path):
+    contents = [b'first cdr\n', b'', os.urandom(3 * 1024 * 1024 + 17)]
+    paths = []
+    for i, content in enumerate(contents):
+        path = tmp_path / ('src_%d.txt' % i)
+        path.write_bytes(content)
+        paths.append(str(path))
+    return paths, contents
+
+
+def test_merge_concatenates_with_separators(tmp_path):
+    paths, contents = write_sources(tmp_path)
+    merged_path = str(tmp_path / 'merged.txt')
+
+    written = merge_files(merged_path, paths + [str(tmp_path / 'missing.txt')])
+
+    expected = b''.join(content + MERGE_SEPARATOR for content in contents)
+    assert open(merged_path, 'rb').read() == expected
+    assert written == len(expected)
+
+
+def test_buffered_fallback_gives_same_bytes(tmp_path, monkeypatch):
+    paths, contents = write_sources(tmp_path)
+    merged_path = str(tmp_path / 'merged.txt')
+    monkeypatch.setitem(merge_engine.KERNEL_COPY, 'copy_file_range', False)
+    monkeypatch.setitem(merge_engine.KERNEL_COPY, 'sendfile', False)
+
+    merge_files(merged_path, paths)
+
+    assert open(merged_path, 'rb').read() == b''.join(content + MERGE_SEPARATOR for content in contents)
+
+
+def test_stream_into_tar_matches_two_step_merge(tmp_path):
+    paths, contents = write_sources(tmp_path)
+    merged_path = str(tmp_path / 'merged.txt')
+    tar_path = str(tmp_path / 'group.tar')
+
+    with tarfile.open(tar_path, 'w') as tar:
+        size = stream_merge_into_tar(tar, 'merged.txt', paths + [str(tmp_path / 'missing.txt')], merged_path)
+
+    expected = b''.join(content + MERGE_SEPARATOR for content in contents)
+    assert size == len(expected)
+    assert open(merged_path, 'rb').read() == expected
+    with tarfile.open(tar_path) as tar:
+        assert tar.getnames() == ['merged.txt']
+        assert tar.extractfile('merged.txt').read() == expected
+
+
+def test_compressed_tar_round_trip(tmp_path):
+    paths, contents = write_sources(tmp_path)
+    tar_path = str(tmp_path / ('group' + tar_extension('gz')))
+
+    with open_tar_for_write(tar_path, 'gz', 1) as tar:
+        stream_merge_into_tar(tar, 'merged.txt', paths)
+
+    with tarfile.open(tar_path) as tar:
+        assert tar.extractfile('merged.txt').read() == b''.join(content + MERGE_SEPARATOR for content in contents)
+    # zstd falls back to a codec this Python has
+    assert tar_extension('zst') in ('.tar.zst', '.tar.gz')
+
+
+@pytest.mark.parametrize('merge_processes, stream_to_tar', [(False, False), (False, True), (True, False)])
+def test_parallel_merges_match_a_sequential_run(tmp_path, monkeypatch, merge_processes, stream_to_tar):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('source')
+    elements = []
+    for i in range(200):
+        name = 'dom%d_gb_%d_d%d_0_0_grp_%d.txt' % (i % 7, i % 3, i % 5, i)
+        with open(os.path.join('source', name), 'wb') as f:
+            f.write(os.urandom(i * 37))
+        elements.append(fileMapping.extract_elements([name])[0])
+
+    def run(merge_workers, merge_processes=False):
+        base_path = 'lab_%d_%s' % (merge_workers, merge_processes)
+        os.makedirs(base_path)
+        merged_files, merged_sizes = fileMapping.create_merged_files_and_tar(
+            base_path, '260101071500', elements, stream_to_tar=stream_to_tar, merge_workers=merge_workers,
+            merge_processes=merge_processes, tar_compression='gz')
+        merged = [(os.path.basename(path), open(path, 'rb').read()) for path in merged_files]
+        tars = {}
+        for tar_name in sorted(os.listdir(base_path)):
+            if tar_name.endswith('.tar.gz'):
+                with tarfile.open(os.path.join(base_path, tar_name)) as tar:
+                    tars[tar_name] = [(member.name, tar.extractfile(member).read()) for member in tar]
+        sizes = {os.path.basename(path): size for path, size in merged_sizes.items()}
+        return merged, tars, sizes
+
+    sequential = run(1)
+    assert run(8, merge_processes) == sequential
+    assert len(sequential[0]) == len(sequential[1]) == 105  # Every (i % 7, i % 3, i % 5) key
@@ -0,0 +1,56 @@
+import json
+import os
+import threading
+
+import fileMapping
+from metrics import Metrics, span, count
+
+
+def test_threads_aggregate_into_one_summary(tmp_path):
+    metrics = Metrics()
+
+    def worker():
+        for _ in range(1000):
+            with span(metrics, 'move'):
+                pass
+            count(metrics, 'files_moved')
+            count(metrics, 'bytes_moved', 10)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with span(None, 'ignored'):
+        count(None, 'ignored')
+
+    summary = metrics.write_summary(str(tmp_path / 'metrics.json'))
+    move = summary['spans']['move']
+    assert move['count'] == 4000
+    assert move['min_us'] <= move['p50_us'] <= move['p99_us'] <= move['max_us']
+    assert summary['counters'] == {'bytes_moved': 40000, 'files_moved': 4000}
+    assert summary['rates']['files_moved_per_second'] > 0
+    assert json.load(open(str(tmp_path / 'metrics.json'))) == summary
+
+
+def test_main_writes_phase_summary(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('source')
+    os.makedirs('resource')
+    with open('resource/domain_file.txt', 'w') as f:
+        f.write('8x8439/gb/2/dh2/0/0/in-for-resellers/12/\n')
+    for i, name in enumerate(['8x8439_gb_2_dh2_0_0_x_%d.txt', 'unknown_de_1_ap_0_0_y_%d.txt', 'bad_%d.txt']):
+        with open(os.path.join('source', name % i), 'w') as f:
+            f.write('row %d\n' % i)
+
+    fileMapping.main()
+
+    window_dir = os.path.join('lab', 'metadata', fileMapping.current_window()[0])
+    summary_name, = [name for name in os.listdir(window_dir) if name.startswith('metrics_')]
+    summary = json.load(open(os.path.join(window_dir, summary_name)))
+    assert {'domain_load', 'scan', 'parse', 'merge', 'tar', 'validate', 'move', 'log'} <= set(summary['spans'])
+    assert summary['counters']['files_parsed'] == 3
+    assert summary['counters']['files_malformed'] == 1
+    assert summary['counters']['groups_routed'] == 1 and summary['counters']['groups_rejected'] == 1
+    assert summary['counters']['files_moved'] == 2
+    assert summary['counters']['lines_logged'] == 1
@@ -0,0 +1,17 @@
+from domain_index import DEST_FIELDS
+from filename_parser import parse_elements
+from parallel_extract import extract_in_workers, iter_routes
+
+
+def test_workers_return_chunks_in_order_with_rejections(tmp_path):
+    domain_file_path = tmp_path / 'domain_file.txt'
+    domain_file_path.write_text('8x8439/gb/2/dh2/0/0/in-for-resellers/12/\n')
+    chunks = [['8x8439_gb_5_dh2_0_0_in-for-resellers_%d.txt' % i, '42com9_de_2_dh2_0_0_numbers_%d.txt' % i,
+               'short_%d.txt' % i] for i in range(5)]
+
+    routes = list(iter_routes(extract_in_workers(iter(chunks), str(domain_file_path), DEST_FIELDS, workers=2),
+                              lambda key: '/'.join(key), '_Exception'))
+
+    expected = [(element_tuple, '/'.join(element_tuple[:4]) if element_tuple[0] == '8x8439' else '_Exception')
+                for chunk in chunks for element_tuple in parse_elements(chunk, DEST_FIELDS)]
+    assert routes == expected
@@ -0,0 +1,45 @@
+import os
+import time
+
+import pytest
+
+from processed_log import ProcessedLogWriter
+
+
+def test_writes_every_name_in_batches(tmp_path):
+    log_file_path = str(tmp_path / 'resource' / 'processed_files_log.txt')
+    names = ['domain_GB_5_D%04d_240723151500.txt' % i for i in range(2500)]
+
+    with ProcessedLogWriter(log_file_path, batch_size=1000, flush_interval=60) as log_writer:
+        for name in names:
+            log_writer.write(name)
+
+    assert open(log_file_path).read().splitlines() == names
+    assert log_writer.batches_written == 3
+
+
+def test_flushes_on_interval(tmp_path):
+    log_file_path = str(tmp_path / 'processed_files_log.txt')
+    log_writer = ProcessedLogWriter(log_file_path, batch_size=1000, flush_interval=0.01)
+    log_writer.write('one.txt')
+    time.sleep(0.5)
+
+    assert open(log_file_path).read() == 'one.txt\n'
+    log_writer.close()
+
+
+def test_on_flush_error_is_raised_by_close_and_later_names_are_kept(tmp_path):
+    log_file_path = str(tmp_path / 'processed_files_log.txt')
+    undecodable = os.fsdecode(b'bad_\xff.txt')
+
+    def on_flush(batch):
+        if batch == ['first.txt']:
+            raise RuntimeError("journal is gone")
+
+    log_writer = ProcessedLogWriter(log_file_path, batch_size=1, on_flush=on_flush)
+    for name in ('first.txt', undecodable, 'lost.txt'):
+        log_writer.write(name)
+    with pytest.raises(RuntimeError):
+        log_writer.close()
+
+    assert open(log_file_path, 'rb').read() == b'first.txt\nbad_\xff.txt\nlost.txt\n'
@@ -0,0 +1,148 @@
+import os
+
+import fileMapping
+from run_journal import RunJournal
+
+
+def test_plan_survives_a_torn_write(tmp_path):
+    journal_path = str(tmp_path / 'journal.jsonl')
+    with RunJournal(journal_path) as journal:
+        journal.plan({'g1': (('a', 'B', 'c', 'D'), ['f1.txt', 'f2.txt'])})
+        journal.record('g1', 'merged')
+    with open(journal_path, 'a') as journal_file:
+        journal_file.write('{"id": "g1", "st')
+
+    with RunJournal(journal_path) as journal:
+        plan = journal.plan({'g1': (('a', 'B', 'c', 'D'), ['f2.txt']), 'g2': (('e', 'F', 'g', 'H'), ['f3.txt'])})
+        assert plan == {'g1': (('a', 'B', 'c', 'D'), ['f1.txt', 'f2.txt']), 'g2': (('e', 'F', 'g', 'H'), ['f3.txt'])}
+        assert journal.done('g1', 'merged') and not journal.done('g1', 'tarred')
+
+
+def test_records_are_committed_in_groups(tmp_path):
+    journal_path = str(tmp_path / 'journal.jsonl')
+
+    def on_disk(group_id, step):
+        with RunJournal(journal_path) as reread:
+            return reread.done(group_id, step)
+
+    with RunJournal(journal_path, commit_every=3, commit_interval=60) as journal:
+        journal.plan({'g1': (('a', 'B', 'c', 'D'), ['f1.txt']), 'g2': (('e', 'F', 'g', 'H'), ['f2.txt'])})
+        journal.record('g1', 'merged')
+        journal.record('g2', 'merged')
+        assert journal.done('g2', 'merged') and on_disk('g1', 'planned') and not on_disk('g1', 'merged')
+        journal.record('g1', 'tarred')
+        assert on_disk('g1', 'merged') and on_disk('g2', 'merged') and on_disk('g1', 'tarred')
+        journal.record('g2', 'tarred')
+        assert not on_disk('g2', 'tarred')
+    assert on_disk('g2', 'tarred')
+
+
+def test_late_files_replan_their_group(tmp_path):
+    journal_path = str(tmp_path / 'journal.jsonl')
+    with RunJournal(journal_path) as journal:
+        journal.plan({'g1': (('a', 'B', 'c', 'D'), ['f1.txt', 'f2.txt'])})
+        journal.record('g1', 'merged', 'tarred', 'moved', 'logged')
+
+    with RunJournal(journal_path) as journal:
+        plan = journal.plan({'g1': (('a', 'B', 'c', 'D'), ['late.txt', 'f1.txt'])})
+        assert plan == {'g1': (('a', 'B', 'c', 'D'), ['f1.txt', 'f2.txt', 'late.txt'])}
+        assert not journal.done('g1', 'merged') and journal.done('g1', 'logged')
+        journal.record('g1', 'merged')
+
+    with RunJournal(journal_path) as journal:
+        assert journal.plan({}) == {'g1': (('a', 'B', 'c', 'D'), ['f1.txt', 'f2.txt', 'late.txt'])}
+        assert journal.done('g1', 'merged') and not journal.done('g1', 'tarred')
+
+
+def test_file_added_between_runs_in_one_window_is_merged(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('source')
+    os.makedirs('resource')
+    with open('resource/domain_file.txt', 'w') as f:
+        f.write('8x8439/gb/2/dh2/0/0/in-for-resellers/12/\n')
+    with open('source/8x8439_gb_2_dh2_0_0_x_1.txt', 'w') as f:
+        f.write('one\n')
+    fileMapping.main(merge_workers=1)
+    with open('source/8x8439_gb_2_dh2_0_0_x_2.txt', 'w') as f:
+        f.write('two\n')
+    fileMapping.main(merge_workers=1)
+
+    date_time_str, time_period = fileMapping.current_window()
+    name = '8x8439_GB_2_DH2_%s.txt' % date_time_str
+    with open(os.path.join('cdrs', date_time_str, time_period, '8x8439', name)) as merged_file:
+        merged = merged_file.read().split()
+    assert merged.count('one') == 1 and merged.count('two') == 1
+    with open('resource/processed_files_log.txt') as log_file:
+        assert log_file.read().split() == [name]
+
+
+def test_interrupted_window_is_finished_without_double_logging(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('source')
+    os.makedirs('resource')
+    with open('resource/domain_file.txt', 'w') as f:
+        f.write('8x8439/gb/2/dh2/0/0/in-for-resellers/12/\n42com9/de/1/ap/0/0/numbers/12/\n')
+    for i, name in enumerate(['8x8439_gb_2_dh2_0_0_x_%d.txt', '42com9_de_1_ap_0_0_y_%d.txt'] * 2):
+        with open(os.path.join('source', name % i), 'w') as f:
+            f.write('row %d\n' % i)
+
+    real_move_file = fileMapping.move_file
+    moves = []
+
+    def crash_after_first_move(src, dst):
+        if moves:
+            raise OSError("simulated crash")
+        moves.append(dst)
+        real_move_file(src, dst)
+
+    monkeypatch.setattr(fileMapping, 'move_file', crash_after_first_move)
+    fileMapping.main(merge_workers=1)
+    monkeypatch.setattr(fileMapping, 'move_file', real_move_file)
+    fileMapping.main(merge_workers=1)
+    fileMapping.main(merge_workers=1)
+
+    with open('resource/processed_files_log.txt') as log_file:
+        logged = sorted(log_file.read().split())
+    date_time_str, time_period = fileMapping.current_window()
+    assert logged == sorted(['8x8439_GB_2_DH2_%s.txt' % date_time_str, '42com9_DE_1_AP_%s.txt' % date_time_str])
+    for name in logged:
+        assert os.path.exists(os.path.join('cdrs', date_time_str, time_period, name.split('_')[0], name))
+
+
+def test_late_files_after_an_interrupted_run_are_logged_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('source')
+    os.makedirs('resource')
+    with open('resource/domain_file.txt', 'w') as f:
+        f.write('8x8439/gb/2/dh2/0/0/in-for-resellers/12/\n42com9/de/1/ap/0/0/numbers/12/\n')
+    names = ['8x8439_gb_2_dh2_0_0_x_%d.txt', '42com9_de_1_ap_0_0_y_%d.txt']
+    for i, name in enumerate(names * 2):
+        with open(os.path.join('source', name % i), 'w') as f:
+            f.write('row %d\n' % i)
+
+    real_move_file = fileMapping.move_file
+
+    def crash_after_first_move(src, dst):
+        monkeypatch.setattr(fileMapping, 'move_file', failing_move_file)
+        real_move_file(src, dst)
+
+    def failing_move_file(src, dst):
+        raise OSError("simulated crash")
+
+    monkeypatch.setattr(fileMapping, 'move_file', crash_after_first_move)
+    fileMapping.main(merge_workers=1)
+    monkeypatch.setattr(fileMapping, 'move_file', real_move_file)
+    for i, name in enumerate(names, start=4):
+        with open(os.path.join('source', name % i), 'w') as f:
+            f.write('late %d\n' % i)
+    fileMapping.main(merge_workers=1)
+    fileMapping.main(merge_workers=1)
+
+    date_time_str, time_period = fileMapping.current_window()
+    expected = sorted(['8x8439_GB_2_DH2_%s.txt' % date_time_str, '42com9_DE_1_AP_%s.txt' % date_time_str])
+    with open('resource/processed_files_log.txt') as log_file:
+        assert sorted(log_file.read().split()) == expected
+    for name in expected:
+        with open(os.path.join('cdrs', date_time_str, time_period, name.split('_')[0], name)) as merged_file:
+            merged = merged_file.read().split()
+        assert merged.count('row') == 2 and merged.count('late') == 1
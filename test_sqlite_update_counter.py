@@ -0,0 +1,96 @@
+import os
+import sqlite3
+from importlib.machinery import SourceFileLoader
+from importlib.util import module_from_spec, spec_from_loader
+
+# The script has no .py extension, so it is loaded from its path
+_loader = SourceFileLoader('sqlite_update_counter',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'SQLite_update_counter'))
+counter = module_from_spec(spec_from_loader(_loader.name, _loader))
+_loader.exec_module(counter)
+
+SCHEMA = ("CREATE TABLE resellers (domain TEXT NOT NULL,groups TEXT NOT NULL,counter INTEGER NOT NULL DEFAULT 0,"
+          "dated INTEGER NOT NULL DEFAULT (STRFTIME('%s', 'NOW')))")
+
+
+def make_db(tmp_path, rows):
+    db_file_path = str(tmp_path / 'marker.db')
+    conn = sqlite3.connect(db_file_path)
+    conn.execute(SCHEMA)
+    conn.executemany('INSERT INTO resellers (domain, "groups", counter, dated) VALUES (?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+    return db_file_path
+
+
+def test_log_is_upserted_as_aggregates(tmp_path):
+    db_file_path = make_db(tmp_path, [('3star170', 'BE_5_EW0', 7, 1720445352)])
+    log_file_path = tmp_path / 'processed_files_log.txt'
+    log_file_path.write_text('3star170_BE_5_EW0_240723151500.txt\n'
+                             '3star170_BE_5_EW0_240723151000.txt\n'
+                             'not a cdr name\n'
+                             '8x8439_DE_2_DH2_240724090000.txt\n')
+
+    counter.update_database(str(log_file_path), db_file_path)
+
+    rows = sqlite3.connect(db_file_path).execute(
+        'SELECT domain, "groups", counter, dated FROM resellers ORDER BY domain').fetchall()
+    assert rows == [('3star170', 'BE_5_EW0', 9, 240723151500), ('8x8439', 'DE_2_DH2', 1, 240724090000)]
+
+
+def test_only_new_lines_are_counted_and_rotation_restarts(tmp_path):
+    db_file_path = make_db(tmp_path, [])
+    log_file_path = tmp_path / 'processed_files_log.txt'
+    log_file_path.write_text('3star170_BE_5_EW0_240723151500.txt\n3star170_BE_5_EW0_2407231516')
+
+    def count():
+        return sqlite3.connect(db_file_path).execute('SELECT counter FROM resellers').fetchone()[0]
+
+    counter.update_database(str(log_file_path), db_file_path)
+    assert count() == 1  # The unfinished last line waits for the next run
+
+    with open(str(log_file_path), 'a') as log_file:
+        log_file.write('00.txt\n')
+    counter.update_database(str(log_file_path), db_file_path)
+    counter.update_database(str(log_file_path), db_file_path)
+    assert count() == 2
+
+    # Rotated by rename, after more lines were logged: the old log is finished before the new one starts
+    with open(str(log_file_path), 'a') as log_file:
+        log_file.write('3star170_BE_5_EW0_240723170000.txt\n')
+    os.rename(str(log_file_path), str(log_file_path) + '.1')
+    log_file_path.write_text('3star170_BE_5_EW0_240724000000.txt\n')
+    counter.update_database(str(log_file_path), db_file_path)
+    assert count() == 4
+
+    # Rotated away for good: only the new log is left to count (written first, so it gets a new inode)
+    (tmp_path / 'next_log').write_text('3star170_BE_5_EW0_240725000000.txt\n')
+    os.remove(str(log_file_path) + '.1')
+    os.replace(str(tmp_path / 'next_log'), str(log_file_path))
+    counter.update_database(str(log_file_path), db_file_path)
+    assert count() == 5
+
+
+def test_undecodable_line_is_skipped_not_retried(tmp_path):
+    db_file_path = make_db(tmp_path, [])
+    log_file_path = tmp_path / 'processed_files_log.txt'
+    log_file_path.write_bytes(b'3star170_BE_5_EW0_240723151500.txt\n\xff\xfe garbage\n')
+    counter.update_database(str(log_file_path), db_file_path)
+
+    with open(str(log_file_path), 'ab') as log_file:
+        log_file.write(b'3star170_BE_5_EW0_240723160000.txt\n')
+    counter.update_database(str(log_file_path), db_file_path)
+    assert sqlite3.connect(db_file_path).execute('SELECT counter FROM resellers').fetchone()[0] == 2
+
+
+def test_tuned_profile_lets_readers_in_during_a_write(tmp_path):
+    db_file_path = make_db(tmp_path, [('3star170', 'BE_5_EW0', 7, 1720445352)])
+    writer = counter.connect(db_file_path, 'tuned')
+    assert writer.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+    writer.execute('BEGIN IMMEDIATE')
+    writer.execute('UPDATE resellers SET counter = counter + 1')
+    reader = counter.connect(db_file_path, 'tuned', read_only=True)
+    assert reader.execute('SELECT counter FROM resellers').fetchone()[0] == 7
+    writer.commit()
+    assert reader.execute('SELECT counter FROM resellers').fetchone()[0] == 8
@@ -0,0 +1,75 @@
+import os
+import time
+
+import pytest
+
+import watcher as watcher_module
+from watcher import InotifyWatcher, PollingWatcher, IN_Q_OVERFLOW, INOTIFY_EVENT
+
+
+def test_polling_waits_for_a_file_to_settle(tmp_path):
+    (tmp_path / 'old.txt').write_text('x')
+    watcher = PollingWatcher(str(tmp_path), interval=0.01)
+    assert watcher.poll() == []
+
+    (tmp_path / 'new.txt').write_text('still writing')
+    (tmp_path / 'skip.tmp').write_text('x')
+    assert watcher.poll() == ['old.txt']
+    assert watcher.poll() == ['new.txt']
+    assert watcher.poll() == []
+
+
+def test_inotify_reports_closed_and_renamed_files(tmp_path):
+    (tmp_path / 'old.txt').write_text('x')
+    try:
+        watcher = InotifyWatcher(str(tmp_path), interval=0.05)
+    except OSError:
+        pytest.skip("inotify is not available")
+
+    with watcher:
+        assert watcher.poll(0) == []
+        assert watcher.poll(1) == ['old.txt']
+        (tmp_path / 'written.txt').write_text('x')
+        (tmp_path / 'part').write_text('x')
+        os.rename(str(tmp_path / 'part'), str(tmp_path / 'moved.txt'))
+        assert sorted(watcher.poll(1) + watcher.poll(0)) == ['moved.txt', 'written.txt']
+
+
+def test_inotify_waits_for_first_scan_files_to_be_closed_or_settle(tmp_path):
+    partial = tmp_path / 'partial.txt'
+    partial.write_text('head')
+    with open(str(partial), 'a') as writer:
+        try:
+            watcher = InotifyWatcher(str(tmp_path), interval=0.05)
+        except OSError:
+            pytest.skip("inotify is not available")
+
+        with watcher:
+            writer.write(' still growing')
+            writer.flush()
+            assert watcher.poll(0) == []
+            writer.write(' tail')
+            writer.flush()
+            assert watcher.poll(0.06) == []
+            writer.close()
+            assert watcher.poll(1) == ['partial.txt']
+            assert watcher.poll(0.1) == []
+
+
+def test_inotify_overflow_rescan_skips_reported_files(tmp_path, monkeypatch):
+    (tmp_path / 'old.txt').write_text('x')
+    try:
+        watcher = InotifyWatcher(str(tmp_path), interval=0.05)
+    except OSError:
+        pytest.skip("inotify is not available")
+
+    with watcher:
+        assert watcher.poll(1) == ['old.txt']
+        (tmp_path / 'first.txt').write_text('x')
+        assert watcher.poll(1) == ['first.txt']
+        (tmp_path / 'lost.txt').write_text('x')
+        overflow = INOTIFY_EVENT.pack(-1, IN_Q_OVERFLOW, 0, 0)
+        monkeypatch.setattr(watcher_module.os, 'read', lambda fd, size: overflow)
+        assert watcher.poll(1) == []
+        time.sleep(0.06)
+        assert watcher.poll(1) == ['lost.txt']
@@ -0,0 +1,51 @@
+import threading
+import time
+
+from worker_pool import AdaptivePool
+
+
+def test_results_in_order_with_bounded_pending():
+    produced = []
+
+    def items():
+        for i in range(500):
+            produced.append(i)
+            yield (i,)
+
+    with AdaptivePool(max_workers=4, epoch_tasks=16, epoch_seconds=0) as pool:
+        results = []
+        for result in pool.map(lambda i: i * 2, items(), max_pending=8):
+            # The producer never runs more than max_pending (plus the item being submitted) ahead
+            assert len(produced) - len(results) <= 8 + 1
+            results.append(result)
+
+    assert results == [i * 2 for i in range(500)]
+    assert pool.stats()['tasks'] == 500
+
+
+def test_scales_up_for_slow_calls_and_backs_off_for_fast_ones():
+    running = []
+    lock = threading.Lock()
+    peak = [0]
+
+    def slow_call():
+        # Like an NFS round trip: the time is spent waiting, so concurrency pays off
+        with lock:
+            running.append(1)
+            peak[0] = max(peak[0], len(running))
+        time.sleep(0.002)
+        with lock:
+            running.pop()
+
+    with AdaptivePool(min_workers=1, max_workers=32, initial_workers=4, epoch_tasks=32,
+                      epoch_seconds=0.02) as pool:
+        for _ in pool.map(slow_call, (() for _ in range(3000))):
+            pass
+    assert pool.peak_workers > 4
+    assert peak[0] <= pool.peak_workers
+
+    with AdaptivePool(min_workers=1, max_workers=32, initial_workers=10, epoch_tasks=64,
+                      epoch_seconds=0.01) as pool:
+        for _ in pool.map(lambda: None, (() for _ in range(5000))):
+            pass
+    assert pool.workers < 10
@@ -0,0 +1,193 @@
+"""Directory watchers for watch mode: inotify through ctypes on Linux, polling elsewhere."""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+
+from dir_scanner import scan_txt_entries
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0)
+
+INOTIFY_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+_READ_SIZE = 64 * 1024
+_MIN_PRUNE_AT = 1024
+
+
+def _signature(file_path):
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _load_libc():
+    if not hasattr(os, 'uname') or os.uname().sysname != 'Linux':
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        getattr(libc, 'inotify_init1')  # Raises AttributeError on a libc without inotify
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class InotifyWatcher:
+    """Reports .txt files closed after writing in, or moved into, one directory."""
+
+    def __init__(self, directory_path, libc=None, interval=0.5):
+        self.directory_path = directory_path
+        self._libc = libc or _load_libc()
+        if self._libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory_path), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            error = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(error, "inotify_add_watch failed", directory_path)
+        self.interval = interval
+        self._reported = set()
+        self._candidates = {}  # name -> (size and mtime, when they were first seen)
+        # Scanned after the watch exists, so nothing lands unseen in between
+        self._add_candidates()
+        self._prune_at = _MIN_PRUNE_AT
+
+    def _scan(self):
+        return [entry.name for entry in scan_txt_entries(self.directory_path)]
+
+    def _add_candidates(self):
+        now = time.monotonic()
+        for name in self._scan():
+            if name not in self._reported and name not in self._candidates:
+                self._candidates[name] = (_signature(os.path.join(self.directory_path, name)), now)
+
+    def poll(self, timeout=None):
+        if self._candidates:
+            # Scanned files are checked again every interval until they settle
+            timeout = self.interval if timeout is None else min(timeout, self.interval)
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        names = self._read_events() if readable else []
+        names.extend(self._settled())
+        self._remember(names)
+        return names
+
+    def _read_events(self):
+        names = []
+        try:
+            data = os.read(self._fd, _READ_SIZE)
+        except BlockingIOError:
+            return names
+        overflow = False
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            if mask & IN_ISDIR or not name.endswith('.txt'):
+                continue
+            # Closed after writing: complete, even if a scan is still waiting for it to settle
+            self._candidates.pop(name, None)
+            names.append(name)
+        if overflow:
+            # The kernel dropped events: every file never reported is checked like the first scan's
+            self._reported.update(names)
+            self._add_candidates()
+        return names
+
+    def _settled(self):
+        names = []
+        now = time.monotonic()
+        for name, (signature, since) in list(self._candidates.items()):
+            current = _signature(os.path.join(self.directory_path, name))
+            if current is None:
+                del self._candidates[name]  # Gone before it settled
+            elif current != signature:
+                self._candidates[name] = (current, now)
+            elif now - since >= self.interval:
+                del self._candidates[name]
+                names.append(name)
+        return names
+
+    def _remember(self, names):
+        self._reported.update(names)
+        if len(self._reported) > self._prune_at:
+            # Forget names no longer in the directory, so files moved out do not pile up
+            self._reported &= set(self._scan())
+            self._prune_at = max(2 * len(self._reported), _MIN_PRUNE_AT)
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PollingWatcher:
+    """Rescans one directory and reports .txt files whose size and mtime held still for one interval."""
+
+    def __init__(self, directory_path, interval=0.5):
+        self.directory_path = directory_path
+        self.interval = interval
+        self._reported = set()
+        self._candidates = {}
+        self._first = True
+
+    def poll(self, timeout=None):
+        if not self._first:
+            time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        names = []
+        present = set()
+        candidates = {}
+        for entry in scan_txt_entries(self.directory_path):
+            present.add(entry.name)
+            if entry.name in self._reported:
+                continue
+            stat = entry.stat()
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self._candidates.get(entry.name) == signature:
+                names.append(entry.name)
+            else:
+                candidates[entry.name] = signature
+        self._first = False
+        self._candidates = candidates
+        self._reported = (self._reported & present) | set(names)
+        return names
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_watcher(directory_path, interval=0.5, use_inotify=True):
+    """Returns an InotifyWatcher where inotify works, otherwise a PollingWatcher."""
+    if use_inotify:
+        try:
+            return InotifyWatcher(directory_path, interval=interval)
+        except OSError as e:
+            print(f"inotify unavailable ({e}), polling {directory_path} every {interval} seconds")
+    return PollingWatcher(directory_path, interval)
@@ -0,0 +1,157 @@
+"""Helpers for feeding work to concurrent.futures executors with backpressure."""
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def bounded_map(executor, fn, iterable, max_pending):
+    """Like executor.map, but never has more than max_pending submitted and unfinished items."""
+    pending = deque()
+    for item in iterable:
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, *item))
+    while pending:
+        yield pending.popleft().result()
+
+
+class _Gate:
+    """Counting semaphore whose limit can change while threads wait on it."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._active = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+
+    def release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    def resize(self, limit):
+        with self._condition:
+            self.limit = limit
+            self._condition.notify_all()
+
+
+class AdaptivePool:
+    """Thread pool for blocking file system calls that sizes its own concurrency from measured throughput."""
+
+    def __init__(self, min_workers=1, max_workers=32, initial_workers=10, epoch_tasks=64, epoch_seconds=0.25,
+                 fast_latency=0.0002):
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.epoch_tasks = epoch_tasks
+        self.epoch_seconds = epoch_seconds
+        self.fast_latency = fast_latency
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._gate = _Gate(max(min_workers, min(initial_workers, max_workers)))
+        self._lock = threading.Lock()
+        self._direction = 0
+        self._previous_throughput = None
+        self._epoch_start = time.perf_counter()
+        self._epoch_tasks_done = 0
+        self._epoch_busy_ns = 0
+        self.tasks = 0
+        self.busy_ns = 0
+        self.adjustments = 0
+        self.peak_workers = self._gate.limit
+        self.history = deque(maxlen=32)  # (workers, tasks per second, mean latency in us) per epoch
+
+    def map(self, fn, iterable, max_pending=None):
+        """Like bounded_map over this pool: fn(*item) for every item, results in submission order."""
+        max_pending = max_pending or self.max_workers * 2
+        return bounded_map(self._executor, self._run, ((fn, item) for item in iterable), max_pending)
+
+    def run(self, fn, iterable, max_pending=None):
+        """fn(*item) for every item, for the side effects; raises the first exception a call raised."""
+        for _ in self.map(fn, iterable, max_pending):
+            pass
+
+    def _run(self, fn, args):
+        self._gate.acquire()
+        start = time.perf_counter_ns()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter_ns() - start
+            self._gate.release()
+            self._task_done(elapsed)
+
+    def _task_done(self, elapsed_ns):
+        with self._lock:
+            self.tasks += 1
+            self.busy_ns += elapsed_ns
+            self._epoch_tasks_done += 1
+            self._epoch_busy_ns += elapsed_ns
+            now = time.perf_counter()
+            seconds = now - self._epoch_start
+            if self._epoch_tasks_done < self.epoch_tasks or seconds < self.epoch_seconds:
+                return
+            self._adjust(self._epoch_tasks_done / seconds, self._epoch_busy_ns / self._epoch_tasks_done / 1e9)
+            self._epoch_start = now
+            self._epoch_tasks_done = 0
+            self._epoch_busy_ns = 0
+
+    def _adjust(self, throughput, latency):
+        workers = self._gate.limit
+        self.history.append((workers, throughput, latency * 1e6))
+        latency_direction = -1 if latency < self.fast_latency else 1
+        previous = self._previous_throughput
+        self._previous_throughput = throughput
+
+        if previous is None:
+            self._direction = latency_direction
+        elif throughput > previous * 1.05:
+            self._direction = self._direction or latency_direction
+        elif throughput < previous * 0.95:
+            self._direction = -self._direction or latency_direction
+        else:
+            # Plateau: fast calls shed threads, slow ones hold what they have
+            self._direction = -1 if latency_direction < 0 else 0
+
+        if self._direction > 0:
+            new_workers = min(self.max_workers, max(workers + 1, math.ceil(workers * 1.5)))
+        elif self._direction < 0:
+            new_workers = max(self.min_workers, min(workers - 1, math.floor(workers / 1.5)))
+        else:
+            new_workers = workers
+        if new_workers != workers:
+            self._gate.resize(new_workers)
+            self.adjustments += 1
+            self.peak_workers = max(self.peak_workers, new_workers)
+
+    @property
+    def workers(self):
+        return self._gate.limit
+
+    def stats(self):
+        """The chosen concurrency and what it was chosen from."""
+        return {
+            'workers': self._gate.limit,
+            'peak_workers': self.peak_workers,
+            'min_workers': self.min_workers,
+            'max_workers': self.max_workers,
+            'adjustments': self.adjustments,
+            'tasks': self.tasks,
+            'mean_latency_us': self.busy_ns / self.tasks / 1e3 if self.tasks else 0.0,
+            'history': [{'workers': workers, 'tasks_per_second': throughput, 'latency_us': latency}
+                        for workers, throughput, latency in self.history],
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()